@@ -0,0 +1,29 @@
+"""job_posts keyset pagination index
+
+Revision ID: 3b7c1e9a0d42
+Revises: f8ea531c3038
+Create Date: 2026-10-18 10:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '3b7c1e9a0d42'
+down_revision: Union[str, None] = 'f8ea531c3038'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Строки с created_at = NULL выпали бы из keyset-пагинации
+    op.execute("UPDATE job_posts SET created_at = COALESCE(parsed_at, now()) WHERE created_at IS NULL")
+    op.create_index('ix_job_posts_created_at_id', 'job_posts', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_job_posts_created_at_id', table_name='job_posts')
@@ -0,0 +1,47 @@
+"""job_posts full-text search vector
+
+Revision ID: 7d2f4a8c5e61
+Revises: 3b7c1e9a0d42
+Create Date: 2026-10-18 11:03:27.550912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = '7d2f4a8c5e61'
+down_revision: Union[str, None] = '3b7c1e9a0d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(industry, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(industry, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # STORED-колонка: Postgres заполняет её для существующих строк при ADD COLUMN
+    # и пересчитывает сам на каждом INSERT/UPDATE
+    op.add_column('job_posts', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(SEARCH_VECTOR_SQL, persisted=True),
+        nullable=True,
+    ))
+    op.create_index('ix_job_posts_search_vector', 'job_posts', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_job_posts_search_vector', table_name='job_posts')
+    op.drop_column('job_posts', 'search_vector')
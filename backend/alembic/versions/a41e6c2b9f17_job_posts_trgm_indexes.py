@@ -0,0 +1,37 @@
+"""job_posts trigram indexes for ILIKE filters
+
+Revision ID: a41e6c2b9f17
+Revises: 7d2f4a8c5e61
+Create Date: 2026-10-18 11:47:05.302661
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a41e6c2b9f17'
+down_revision: Union[str, None] = '7d2f4a8c5e61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRGM_COLUMNS = ('title', 'industry', 'format', 'location', 'description')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in TRGM_COLUMNS:
+        op.create_index(
+            f'ix_job_posts_{column}_trgm', 'job_posts', [column], unique=False,
+            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in TRGM_COLUMNS:
+        op.drop_index(f'ix_job_posts_{column}_trgm', table_name='job_posts')
+    # расширение не удаляем: им могут пользоваться и другие объекты БД
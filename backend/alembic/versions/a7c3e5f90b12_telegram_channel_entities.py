@@ -0,0 +1,38 @@
+"""telegram_channel_entities table
+
+Revision ID: a7c3e5f90b12
+Revises: f4b2d8e61a37
+Create Date: 2026-10-18 18:31:07.524913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a7c3e5f90b12'
+down_revision: Union[str, None] = 'f4b2d8e61a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('telegram_channel_entities',
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('channel_id', sa.BigInteger(), nullable=True),
+    sa.Column('access_hash', sa.BigInteger(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('resolved_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('username')
+    )
+    op.create_index(op.f('ix_telegram_channel_entities_expires_at'), 'telegram_channel_entities', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_telegram_channel_entities_expires_at'), table_name='telegram_channel_entities')
+    op.drop_table('telegram_channel_entities')
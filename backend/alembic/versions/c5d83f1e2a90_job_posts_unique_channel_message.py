@@ -0,0 +1,38 @@
+"""job_posts unique (channel_name, telegram_message_id)
+
+Revision ID: c5d83f1e2a90
+Revises: a41e6c2b9f17
+Create Date: 2026-10-18 12:31:44.871250
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c5d83f1e2a90'
+down_revision: Union[str, None] = 'a41e6c2b9f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Дубликаты могли появиться из-за гонки SELECT -> INSERT; оставляем самую раннюю запись
+    op.execute("""
+        DELETE FROM job_posts a
+        USING job_posts b
+        WHERE a.channel_name = b.channel_name
+          AND a.telegram_message_id = b.telegram_message_id
+          AND a.id > b.id
+    """)
+    op.create_index(
+        'uq_job_posts_channel_message', 'job_posts',
+        ['channel_name', 'telegram_message_id'], unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_job_posts_channel_message', table_name='job_posts')
@@ -0,0 +1,40 @@
+"""channel_sync_state high-water marks
+
+Revision ID: e9a1b7d3c254
+Revises: c5d83f1e2a90
+Create Date: 2026-10-18 13:15:09.664318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e9a1b7d3c254'
+down_revision: Union[str, None] = 'c5d83f1e2a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('channel_sync_state',
+    sa.Column('channel_name', sa.String(), nullable=False),
+    sa.Column('last_message_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('channel_name')
+    )
+    # Стартовые отметки из уже сохранённых вакансий, чтобы первый запуск не перечитывал каналы
+    op.execute("""
+        INSERT INTO channel_sync_state (channel_name, last_message_id, updated_at)
+        SELECT channel_name, max(telegram_message_id), now()
+        FROM job_posts
+        WHERE channel_name IS NOT NULL AND telegram_message_id IS NOT NULL
+        GROUP BY channel_name
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('channel_sync_state')
@@ -0,0 +1,38 @@
+"""resume_analysis_cache table
+
+Revision ID: f4b2d8e61a37
+Revises: e9a1b7d3c254
+Create Date: 2026-10-18 18:20:41.208517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = 'f4b2d8e61a37'
+down_revision: Union[str, None] = 'e9a1b7d3c254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('resume_analysis_cache',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('prompt_version', sa.String(), nullable=False),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('accessed_at', sa.DateTime(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_resume_analysis_cache_accessed_at'), 'resume_analysis_cache', ['accessed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_resume_analysis_cache_accessed_at'), table_name='resume_analysis_cache')
+    op.drop_table('resume_analysis_cache')
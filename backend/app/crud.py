@@ -1,27 +1,66 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, update, delete, and_, or_, tuple_, func, cast, case, any_, bindparam, REAL, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError
-from app.models import JobPost, UserProfile, User, UserTelegramChannel
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models import JobPost, UserProfile, User, UserTelegramChannel, ChannelSyncState, ResumeAnalysisCache, TelegramChannelEntity
 from app.schemas import JobPostCreate, UserProfileCreate, UserCreate
+from app.utils.pagination import encode_cursor, encode_rank_cursor
+from app.utils.recommend import profile_search_query, RECOMMEND_CANDIDATES
+from app.utils.recommend_cache import recommendation_cache
+from app.utils.job_index import job_index, INDEXED_FIELDS
+from app.utils.job_vectors import job_vectors
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
+import os
+from app.utils.passwords import password_hasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Кэш анализа резюме: срок жизни записи и потолок числа записей (вытесняются давно не использованные)
+RESUME_CACHE_TTL_DAYS = float(os.getenv("RESUME_CACHE_TTL_DAYS", "90"))
+RESUME_CACHE_MAX_ENTRIES = int(os.getenv("RESUME_CACHE_MAX_ENTRIES", "10000"))
 
+# Кэш проверки Telegram-каналов: найденный канал живёт долго, «нет такого / закрытый» — недолго
+CHANNEL_ENTITY_TTL_HOURS = float(os.getenv("CHANNEL_ENTITY_TTL_HOURS", "168"))
+CHANNEL_ENTITY_NEGATIVE_TTL_HOURS = float(os.getenv("CHANNEL_ENTITY_NEGATIVE_TTL_HOURS", "1"))
 
-# ✅ Создание или обновление вакансии
-async def create_or_update_job_post(db: AsyncSession, job: JobPostCreate):
-    # Поиск дубликата по telegram_message_id + channel_name
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_BATCH_SIZE = 500
+
+JOB_CONFLICT_KEY = ["channel_name", "telegram_message_id"]
+
+# Индексы вакансий в памяти процесса: обновляются при каждой записи и удалении вакансий
+JOB_MEMORY_INDEXES = (job_index, job_vectors)
+
+
+def index_job_rows(rows):
+    """rows: [(id, *INDEXED_FIELDS)]"""
+    for index in JOB_MEMORY_INDEXES:
+        index.add_many(rows)
+
+
+def unindex_jobs(job_ids):
+    for index in JOB_MEMORY_INDEXES:
+        index.remove(job_ids)
+
+
+# ✅ Вакансия по каналу и id сообщения
+async def get_job_by_message(db: AsyncSession, channel_name: str, telegram_message_id: int):
     result = await db.execute(
         select(JobPost).where(
             and_(
-                JobPost.telegram_message_id == job.telegram_message_id,
-                JobPost.channel_name == job.channel_name
+                JobPost.telegram_message_id == telegram_message_id,
+                JobPost.channel_name == channel_name
             )
         )
     )
-    existing_job = result.scalars().first()
+    return result.scalars().first()
+
+
+# ✅ Создание или обновление вакансии
+async def create_or_update_job_post(db: AsyncSession, job: JobPostCreate):
+    # Поиск дубликата по telegram_message_id + channel_name
+    existing_job = await get_job_by_message(db, job.channel_name, job.telegram_message_id)
 
     job_data = job.dict(exclude_unset=True)
 
@@ -32,23 +71,301 @@ async def create_or_update_job_post(db: AsyncSession, job: JobPostCreate):
         # Создание новой вакансии
         db_job = JobPost(**job_data)
         db.add(db_job)
-        await db.commit()
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            # параллельный запрос успел вставить ту же вакансию (uq_job_posts_channel_message) —
+            # отдаём её; любое другое нарушение (NOT NULL, FK, ...) пробрасываем
+            existing_job = await get_job_by_message(db, job.channel_name, job.telegram_message_id)
+            if existing_job is None:
+                raise
+            return existing_job
+        recommendation_cache.bump_jobs_version()
         await db.refresh(db_job)
+        index_job_rows([(db_job.id, *(getattr(db_job, f) for f in INDEXED_FIELDS))])
         return db_job
 
 
-# ✅ Получить все вакансии
-async def get_all_jobs(db: AsyncSession):
-    result = await db.execute(select(JobPost).order_by(JobPost.created_at.desc()))
+# ✅ Пакетная запись вакансий одним INSERT ... ON CONFLICT
+async def bulk_upsert_job_posts(db: AsyncSession, jobs: list[JobPostCreate], update: bool = False) -> int:
+    """
+    update=False — дубликаты по (channel_name, telegram_message_id) пропускаются (как в create_or_update_job_post),
+    update=True — существующие вакансии перезаписываются. Возвращает число записанных строк.
+    """
+    if not jobs:
+        return 0
+
+    now = datetime.utcnow()
+    rows = {}
+    for job in jobs:
+        data = job.dict()
+        # в multi-row INSERT колоночные default'ы модели не срабатывают — заполняем сами
+        data["created_at"] = data["created_at"] or now
+        data["contact_info"] = data["contact_info"] or "telegram"
+        data["parsed_at"] = now
+        key = (data["channel_name"], data["telegram_message_id"])
+        if None in key:
+            key = ("__manual__", len(rows))  # NULL не конфликтует в unique-индексе, пишем как есть
+        rows[key] = data  # дубликаты внутри пачки: побеждает последний
+
+    stmt = pg_insert(JobPost).values(list(rows.values()))
+    if update:
+        updatable = [c for c in rows[next(iter(rows))] if c not in JOB_CONFLICT_KEY]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=JOB_CONFLICT_KEY,
+            set_={c: stmt.excluded[c] for c in updatable},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=JOB_CONFLICT_KEY)
+
+    # возвращаем и текстовые поля — записанные строки сразу попадают в индекс без повторного чтения
+    result = await db.execute(stmt.returning(JobPost.id, *(getattr(JobPost, f) for f in INDEXED_FIELDS)))
+    written_rows = result.all()
+    await db.commit()
+    if written_rows:
+        recommendation_cache.bump_jobs_version()
+        index_job_rows(written_rows)
+    return len(written_rows)
+
+
+# ✅ Какие сообщения канала уже сохранены (по uq_job_posts_channel_message)
+async def get_existing_message_ids(db: AsyncSession, channel_name: str, message_ids: list[int]) -> list[int]:
+    if not message_ids:
+        return []
+    result = await db.execute(
+        select(JobPost.telegram_message_id).where(
+            and_(
+                JobPost.channel_name == channel_name,
+                JobPost.telegram_message_id.in_(message_ids),
+            )
+        )
+    )
+    return result.scalars().all()
+
+
+# ✅ Кандидаты из инвертированного индекса: id вакансий, где может встретиться хоть один паттерн
+async def get_indexed_candidates(db: AsyncSession, patterns: list[str], like: bool = False):
+    """None — индекс ещё не построен или сузить нельзя, фильтровать по id не нужно. like — паттерны для ILIKE."""
+    if not job_index.ready:
+        return None
+    # вакансии, записанные другим процессом, догружаем по id > max_id (дёшево: PK-range)
+    await job_index.sync(db)
+    return job_index.candidates(patterns, like)
+
+
+def job_id_in(ids):
+    # один параметр-массив вместо IN (...) с тысячами bind-параметров
+    return JobPost.id == any_(bindparam(None, sorted(ids), type_=ARRAY(Integer)))
+
+
+# ✅ Вакансии для fallback-рекомендаций: только те, где есть хоть одно совпадение с профилем
+async def get_jobs_matching_any(db: AsyncSession, patterns: list[str]) -> list[JobPost]:
+    ids = await get_indexed_candidates(db, patterns)
+    if ids is not None and not ids:
+        return []
+    stmt = select(JobPost)
+    if ids is not None:
+        stmt = stmt.where(job_id_in(ids))
+    result = await db.execute(stmt)
     return result.scalars().all()
 
 
+# ✅ Вакансии, близкие к профилю по TF-IDF векторам (локально, без LLM)
+async def get_similar_jobs(db: AsyncSession, profile: UserProfile, limit: int = 30):
+    """[(job, similarity)] по убыванию близости; None — матрица векторов ещё не построена."""
+    if not job_vectors.ready:
+        return None
+    await job_vectors.sync(db)
+    similar = job_vectors.top_for_profile(profile, limit)
+    if not similar:
+        return []
+    result = await db.execute(select(JobPost).where(job_id_in([job_id for job_id, _ in similar])))
+    jobs = {job.id: job for job in result.scalars().all()}
+    return [(jobs[job_id], similarity) for job_id, similarity in similar if job_id in jobs]
+
+
+# ✅ Keyset-пагинация по (created_at, id) — использует индекс ix_job_posts_created_at_id
+async def paginate_jobs(db: AsyncSession, stmt, limit: int = DEFAULT_PAGE_SIZE, cursor=None):
+    """cursor — уже декодированная пара (created_at, id). Возвращает (items, next_cursor)."""
+    if cursor is not None:
+        if not isinstance(cursor[0], datetime):
+            raise ValueError("Cursor does not match the requested ordering")
+        stmt = stmt.where(tuple_(JobPost.created_at, JobPost.id) < tuple_(*cursor))
+    stmt = stmt.order_by(JobPost.created_at.desc(), JobPost.id.desc()).limit(limit + 1)
+    result = await db.execute(stmt)
+    rows = result.scalars().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor
+
+
+# ✅ Keyset-пагинация по (ts_rank, id) для полнотекстового поиска
+async def paginate_ranked_jobs(db: AsyncSession, stmt, rank, limit: int = DEFAULT_PAGE_SIZE, cursor=None):
+    """rank — SQL-выражение ts_rank(...). cursor — пара (rank, id)."""
+    if cursor is not None:
+        if not isinstance(cursor[0], float):
+            raise ValueError("Cursor does not match the requested ordering")
+        # ts_rank возвращает real, поэтому сравниваем тоже в real — иначе граница страницы «плывёт»
+        stmt = stmt.where(tuple_(rank, JobPost.id) < tuple_(cast(cursor[0], REAL), cursor[1]))
+    stmt = stmt.add_columns(rank).order_by(rank.desc(), JobPost.id.desc()).limit(limit + 1)
+    result = await db.execute(stmt)
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_job, last_rank = rows[-1]
+        next_cursor = encode_rank_cursor(last_rank, last_job.id)
+    return [job for job, _ in rows], next_cursor
+
+
+# ✅ tsquery по тексту пользователя: русская и английская морфология через OR
+def build_search_query(q: str):
+    return func.websearch_to_tsquery("russian", q).op("||")(func.websearch_to_tsquery("english", q))
+
+
+# ✅ Получить все вакансии (постранично)
+async def get_all_jobs(db: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor=None):
+    return await paginate_jobs(db, select(JobPost), limit=limit, cursor=cursor)
+
+
+# ✅ Версия набора вакансий для кэша рекомендаций: локальный счётчик + отпечаток таблицы из БД.
+# Изменения из других процессов (ингестер, другие воркеры) ловит отпечаток: max(id) — вставки,
+# max(parsed_at) — перезапись через /jobs/batch?on_conflict=update, count(*) — удаления
+async def get_jobs_version(db: AsyncSession):
+    result = await db.execute(select(func.count(), func.max(JobPost.id), func.max(JobPost.parsed_at)))
+    count, max_id, last_parsed = result.one()
+    return recommendation_cache.jobs_version, count, max_id, last_parsed
+
+
 # ✅ Получить все уникальные каналы
 async def get_all_unique_channels(db: AsyncSession):
     result = await db.execute(select(UserTelegramChannel.channel_username).distinct())
     return result.scalars().all()
 
 
+# ✅ Каналы пользователя
+async def get_user_channels(db: AsyncSession, user_id: int):
+    result = await db.execute(select(UserTelegramChannel).where(UserTelegramChannel.user_id == user_id))
+    return result.scalars().all()
+
+
+# ✅ High-water marks ингестера: {channel_name: last_message_id}
+async def get_channel_sync_state(db: AsyncSession) -> dict:
+    result = await db.execute(select(ChannelSyncState.channel_name, ChannelSyncState.last_message_id))
+    return {channel: last_id for channel, last_id in result.all()}
+
+
+# ✅ Сдвинуть high-water mark канала (только вперёд)
+async def set_channel_sync_state(db: AsyncSession, channel_name: str, last_message_id: int) -> int:
+    stmt = pg_insert(ChannelSyncState).values(
+        channel_name=channel_name,
+        last_message_id=last_message_id,
+        updated_at=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ChannelSyncState.channel_name],
+        set_={
+            "last_message_id": func.greatest(ChannelSyncState.last_message_id, stmt.excluded.last_message_id),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ).returning(ChannelSyncState.last_message_id)
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.scalar_one()
+
+
+# ✅ Кэш анализа резюме (resume_analysis_cache)
+async def get_cached_resume_analysis(db: AsyncSession, key: str):
+    """
+    Результат анализа или None. Отметка доступа коммитится сразу: при промахе дальше идёт вызов LLM,
+    и открытая транзакция держала бы соединение пула «idle in transaction» до LLM_TIMEOUT.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=RESUME_CACHE_TTL_DAYS)
+    result = await db.execute(
+        update(ResumeAnalysisCache)
+        .where(ResumeAnalysisCache.key == key, ResumeAnalysisCache.created_at >= cutoff)
+        .values(accessed_at=datetime.utcnow(), hits=ResumeAnalysisCache.hits + 1)
+        .returning(ResumeAnalysisCache.result)
+    )
+    cached = result.scalar_one_or_none()
+    await db.commit()
+    return cached
+
+
+async def save_resume_analysis(db: AsyncSession, key: str, prompt_version: str, analysis: dict):
+    now = datetime.utcnow()
+    stmt = pg_insert(ResumeAnalysisCache).values(
+        key=key, prompt_version=prompt_version, result=analysis, created_at=now, accessed_at=now, hits=0,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ResumeAnalysisCache.key],
+        set_={"result": stmt.excluded.result, "created_at": now, "accessed_at": now},
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def evict_resume_analysis_cache(db: AsyncSession) -> int:
+    """Удаляет записи старше TTL и всё сверх RESUME_CACHE_MAX_ENTRIES по давности использования."""
+    cutoff = datetime.utcnow() - timedelta(days=RESUME_CACHE_TTL_DAYS)
+    expired = await db.execute(delete(ResumeAnalysisCache).where(ResumeAnalysisCache.created_at < cutoff))
+    keep = (
+        select(ResumeAnalysisCache.key)
+        .order_by(ResumeAnalysisCache.accessed_at.desc())
+        .limit(RESUME_CACHE_MAX_ENTRIES)
+    )
+    overflow = await db.execute(delete(ResumeAnalysisCache).where(ResumeAnalysisCache.key.not_in(keep)))
+    await db.commit()
+    return expired.rowcount + overflow.rowcount
+
+
+# ✅ Кэш проверки Telegram-каналов (telegram_channel_entities)
+async def get_channel_entity(db: AsyncSession, username: str):
+    """Непросроченная запись о канале (dict-подобная) или None."""
+    result = await db.execute(
+        select(
+            TelegramChannelEntity.username, TelegramChannelEntity.status, TelegramChannelEntity.channel_id,
+            TelegramChannelEntity.access_hash, TelegramChannelEntity.title,
+        ).where(
+            TelegramChannelEntity.username == username,
+            TelegramChannelEntity.expires_at > datetime.utcnow(),
+        )
+    )
+    return result.mappings().first()
+
+
+async def save_channel_entity(db: AsyncSession, username: str, status: str, channel_id: int = None,
+                              access_hash: int = None, title: str = None):
+    now = datetime.utcnow()
+    ttl = CHANNEL_ENTITY_TTL_HOURS if status == "public" else CHANNEL_ENTITY_NEGATIVE_TTL_HOURS
+    values = dict(
+        status=status, channel_id=channel_id, access_hash=access_hash, title=title,
+        resolved_at=now, expires_at=now + timedelta(hours=ttl),
+    )
+    stmt = pg_insert(TelegramChannelEntity).values(username=username, **values)
+    stmt = stmt.on_conflict_do_update(index_elements=[TelegramChannelEntity.username], set_=values)
+    await db.execute(stmt)
+    await db.commit()
+    return {"username": username, "status": status, "channel_id": channel_id, "access_hash": access_hash, "title": title}
+
+
+async def delete_channel_entity(db: AsyncSession, username: str):
+    await db.execute(delete(TelegramChannelEntity).where(TelegramChannelEntity.username == username))
+    await db.commit()
+
+
+async def evict_channel_entities(db: AsyncSession) -> int:
+    result = await db.execute(delete(TelegramChannelEntity).where(TelegramChannelEntity.expires_at <= datetime.utcnow()))
+    await db.commit()
+    return result.rowcount
+
+
 # ✅ Создать профиль пользователя
 async def create_user_profile(db: AsyncSession, profile: UserProfileCreate):
     db_profile = UserProfile(**profile.dict())
@@ -107,6 +424,35 @@ async def recommend_jobs_for_user(db: AsyncSession, user: UserProfile) -> list[J
     return result.scalars().all()
 
 
+# ✅ Дешёвый отбор кандидатов для рекомендаций: полнотекстовый поиск по навыкам/должности/индустриям
+async def retrieve_job_candidates(db: AsyncSession, profile: UserProfile, limit: int = RECOMMEND_CANDIDATES) -> list[JobPost]:
+    candidates = []
+    q = profile_search_query(profile)
+    if q:
+        ts_query = build_search_query(q)
+        score = func.ts_rank(JobPost.search_vector, ts_query)
+        # небольшие бонусы за город и формат из предпочтений
+        if profile.desired_city:
+            score = score + case((JobPost.location.ilike(f"%{profile.desired_city}%"), 0.2), else_=0.0)
+        if profile.desired_format:
+            score = score + case((JobPost.format.ilike(f"%{profile.desired_format}%"), 0.1), else_=0.0)
+        stmt = (
+            select(JobPost)
+            .where(JobPost.search_vector.op("@@")(ts_query))
+            .order_by(score.desc(), JobPost.created_at.desc())
+            .limit(limit)
+        )
+        candidates = list((await db.execute(stmt)).scalars().all())
+
+    # не хватило совпадений — добираем свежими вакансиями
+    if len(candidates) < limit:
+        stmt = select(JobPost).order_by(JobPost.created_at.desc(), JobPost.id.desc()).limit(limit - len(candidates))
+        if candidates:
+            stmt = stmt.where(JobPost.id.notin_([job.id for job in candidates]))
+        candidates += (await db.execute(stmt)).scalars().all()
+    return candidates
+
+
 async def get_user_by_email_or_phone(db: AsyncSession, email: str = None, phone: str = None):
     query = None
     if email:
@@ -120,7 +466,7 @@ async def get_user_by_email_or_phone(db: AsyncSession, email: str = None, phone:
 
 
 async def create_user(db: AsyncSession, user: UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     
     # Создаём пустой профиль
     db_profile = UserProfile(
@@ -145,12 +491,23 @@ async def create_user(db: AsyncSession, user: UserCreate):
     return db_user
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# ✅ Проверить пароль (в пуле хеширования); хеш с устаревшим cost factor заменяется новым
+async def verify_password(db: AsyncSession, user: User, plain_password: str) -> bool:
+    ok, new_hash = await password_hasher.verify_and_update(plain_password, user.hashed_password)
+    if ok and new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+        await db.refresh(user)
+    return ok
 
 
 # ✅ Поиск вакансий с фильтрацией
-async def search_jobs(db: AsyncSession, salary_min=None, industry=None, title=None, format=None, location=None):
+async def search_jobs(db: AsyncSession, salary_min=None, industry=None, title=None, format=None, location=None,
+                      q=None, search_mode: str = "fts", limit: int = DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    q — свободный текст. search_mode="fts" ищет по search_vector и сортирует по ts_rank,
+    search_mode="ilike" — старый путь через ILIKE по title/description/industry (для сравнения).
+    """
     stmt = select(JobPost)
     filters = []
     if salary_min is not None:
@@ -164,10 +521,27 @@ async def search_jobs(db: AsyncSession, salary_min=None, industry=None, title=No
     if location:
         filters.append(JobPost.location.ilike(f"%{location}%"))
     
+    if q and search_mode == "ilike":
+        # индекс отсекает вакансии без токенов запроса, ILIKE ниже проверяет точное совпадение
+        candidate_ids = await get_indexed_candidates(db, [q], like=True)
+        if candidate_ids is not None:
+            if not candidate_ids:
+                return [], None
+            filters.append(job_id_in(candidate_ids))
+        filters.append(or_(
+            JobPost.title.ilike(f"%{q}%"),
+            JobPost.description.ilike(f"%{q}%"),
+            JobPost.industry.ilike(f"%{q}%"),
+        ))
+
     # Применяем фильтры только если они есть
     if filters:
         stmt = stmt.where(and_(*filters))
-    
-    stmt = stmt.order_by(JobPost.created_at.desc())
-    result = await db.execute(stmt)
-    return result.scalars().all()
+
+    if q and search_mode == "fts":
+        ts_query = build_search_query(q)
+        stmt = stmt.where(JobPost.search_vector.op("@@")(ts_query))
+        rank = func.ts_rank(JobPost.search_vector, ts_query)
+        return await paginate_ranked_jobs(db, stmt, rank, limit=limit, cursor=cursor)
+
+    return await paginate_jobs(db, stmt, limit=limit, cursor=cursor)
@@ -14,20 +14,28 @@ import google.generativeai as genai
 from dotenv import load_dotenv
 from fastapi import APIRouter
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, JSONResponse
 
 from app.db import AsyncSessionLocal, get_db
 from app.models import JobPost, UserProfile, User
 from app import schemas, crud
 from app.schemas import UserProfileCreate, UserProfileOut, JobPostOut
 from app.crud import create_user_profile, get_user_profile, recommend_jobs_for_user, create_or_update_job_post, get_user_profile_by_user_id
-from app.utils.pdf import extract_text_from_pdf
-from app.utils.gemini import extract_json_from_response
+from app.utils.pdf import read_upload, extract_pdf
+from app.utils.resume_tasks import resume_tasks, QueueFull
+from app.utils.gemini import extract_json_from_response, resume_analysis_key, RESUME_PROMPT_VERSION
 from app.utils.gemini import analyze_resume_with_openai as analyze_resume_with_gemini
-from app.utils.gemini import recommend_jobs_with_openai
+from app.utils.gemini import recommend_jobs_with_openai, stream_recommendations_with_openai
+from app.utils.recommend import trim_job_for_llm, trim_profile_for_llm
+from app.utils.matcher import ProfileMatcher
+from app.utils.recommend_cache import recommendation_cache, profile_version
 
 from app.routes.jobs import router as jobs_router
 from app.routes.auth import router as auth_router, get_current_user
+from app.utils.principals import UserPrincipal
 from app.routes.channels import router as channels_router
+from app.utils.telegram_client import telegram_gateway
 
 
 load_dotenv()
@@ -71,6 +79,12 @@ async def startup_all():
     await wait_for_db()
     await asyncio.sleep(1)
     asyncio.create_task(clean_old_jobs())
+    asyncio.create_task(build_job_indexes())
+    resume_tasks.start(process_resume_task)
+
+@app.on_event("shutdown")
+async def shutdown_all():
+    await telegram_gateway.close()
 
 @app.get("/")
 async def root():
@@ -87,7 +101,7 @@ async def create_profile(profile: UserProfileCreate, db: AsyncSession = Depends(
     return await create_user_profile(db, profile)
 
 @app.get("/profile", response_model=UserProfileOut)
-async def read_profile(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def read_profile(db: AsyncSession = Depends(get_db), current_user: UserPrincipal = Depends(get_current_user)):
     result = await db.execute(select(UserProfile).where(UserProfile.user_id == current_user.id))
     profile = result.scalars().first()
     if not profile:
@@ -98,7 +112,7 @@ async def read_profile(db: AsyncSession = Depends(get_db), current_user: User =
 async def update_profile(
     profile_data: schemas.UserProfileCreate = Body(...),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     result = await db.execute(select(UserProfile).where(UserProfile.user_id == current_user.id))
     profile = result.scalars().first()
@@ -110,6 +124,7 @@ async def update_profile(
     
     await db.commit()
     await db.refresh(profile)
+    recommendation_cache.invalidate_user(current_user.id)
     return profile
 
 
@@ -129,13 +144,50 @@ async def update_profile(
 @app.post("/upload_resume")
 async def upload_resume(
     file: UploadFile = File(...),
+    background: bool = Query(False),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
-    text = await extract_text_from_pdf(file)
-    gpt_data = analyze_resume_with_gemini(text)
+    content = await read_upload(file)  # лимит PDF_MAX_BYTES проверяется по ходу чтения
+    if background:
+        # 202 сразу: разбор PDF и LLM идут в очереди, статус — GET /upload_resume/{task_id}
+        try:
+            task = resume_tasks.submit(current_user.id, content)
+        except QueueFull:
+            raise HTTPException(status_code=503, detail="Очередь обработки резюме переполнена, попробуйте позже")
+        return JSONResponse(status_code=202, content=jsonable_encoder(task.public()))
 
-    result = await db.execute(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    return await apply_resume(db, current_user.id, content)
+
+
+@app.get("/upload_resume/{task_id}")
+async def upload_resume_status(task_id: str, current_user: UserPrincipal = Depends(get_current_user)):
+    task = resume_tasks.get(task_id)
+    if task is None or task.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return task.public()
+
+
+async def process_resume_task(user_id: int, content: bytes) -> dict:
+    # у фоновой задачи своя сессия: сессия запроса к этому моменту уже закрыта
+    async with AsyncSessionLocal() as db:
+        return await apply_resume(db, user_id, content)
+
+
+async def apply_resume(db: AsyncSession, user_id: int, content: bytes) -> dict:
+    # разбор PDF в пуле процессов — цикл событий не блокируется даже на больших файлах
+    extraction = await extract_pdf(content)
+    text = extraction.text
+
+    # тот же текст уже разбирали этой версией промпта — берём результат из кэша, без LLM
+    analysis_key = resume_analysis_key(text)
+    gpt_data = await crud.get_cached_resume_analysis(db, analysis_key)
+    analysis_cached = gpt_data is not None
+    if not analysis_cached:
+        gpt_data = await analyze_resume_with_gemini(text)
+        await crud.save_resume_analysis(db, analysis_key, RESUME_PROMPT_VERSION, gpt_data)
+
+    result = await db.execute(select(UserProfile).where(UserProfile.user_id == user_id))
     profile = result.scalars().first()
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found for the current user")
@@ -163,10 +215,13 @@ async def upload_resume(
 
     await db.commit()
     await db.refresh(profile)
+    recommendation_cache.invalidate_user(user_id)
 
     # Возвращаем все основные поля профиля
     return {
         "message": "Резюме обработано и профиль обновлён",
+        "pdf": extraction.stats(),
+        "analysis_cached": analysis_cached,
         "profile": {field: getattr(profile, field) for field in [
             "id", "full_name", "gender", "phone_number", "email", "citizenship", "address", "education",
             "experience", "experience_level", "skills", "languages", "interests", "achievements", "resume_text",
@@ -182,152 +237,147 @@ async def recommend_jobs(user_id: int = Query(...), db: AsyncSession = Depends(g
     if not profile:
         raise HTTPException(status_code=404, detail="User profile not found")
 
-    result = await db.execute(select(JobPost))
-    jobs = result.scalars().all()
+    # Повторный визит без изменений профиля и вакансий — отдаём из кэша, без LLM
+    profile_ver = profile_version(profile)
+    jobs_ver = await crud.get_jobs_version(db)
+    cached = recommendation_cache.get(user_id, profile_ver, jobs_ver)
+    if cached is not None:
+        return cached
+
+    recommended, from_llm = await build_recommendations(profile, db)
+    # fallback не кэшируем: иначе один сбой LLM закрепил бы локальный список на весь TTL
+    if from_llm:
+        recommendation_cache.set(user_id, profile_ver, jobs_ver, recommended)
+    return recommended
 
-    # Преобразуем профиль и вакансии в dict для LLM
-    profile_dict = {field: getattr(profile, field) for field in profile.__table__.columns.keys()}
-    jobs_dicts = [
-        {field: getattr(job, field) for field in job.__table__.columns.keys()}
-        for job in jobs
-    ]
+
+def job_with_reasons(job: JobPost, reasons: list) -> dict:
+    job_out = JobPostOut.from_orm(job).dict()
+    job_out["reasons"] = reasons
+    return job_out
+
+
+async def build_recommendations(profile: UserProfile, db: AsyncSession) -> tuple:
+    """(рекомендации, получены ли они от LLM) — при сбое LLM локальный скоринг."""
+    # Этап 1: дешёвый отбор короткого списка в БД (полнотекстовый поиск по профилю)
+    candidates = await crud.retrieve_job_candidates(db, profile)
+
+    # Этап 2: в LLM уходит только шорт-лист и только нужные поля — размер промпта не зависит от числа вакансий
+    profile_dict = trim_profile_for_llm(profile)
+    jobs_dicts = [trim_job_for_llm(job) for job in candidates]
 
     try:
-        llm_recs = recommend_jobs_with_openai(profile_dict, jobs_dicts)
+        llm_recs = await recommend_jobs_with_openai(profile_dict, jobs_dicts)
         # llm_recs: [{"id": <job_id>, "reasons": [..]}]
-        id_to_job = {job.id: job for job in jobs}
+        id_to_job = {job.id: job for job in candidates}
         recommended = []
         for rec in llm_recs:
             job = id_to_job.get(rec["id"])
             if job:
-                job_out = JobPostOut.from_orm(job).dict()
-                job_out["reasons"] = rec.get("reasons", [])
-                recommended.append(job_out)
-        return recommended[:30]
+                recommended.append(job_with_reasons(job, rec.get("reasons", [])))
+        if not recommended:
+            raise ValueError("LLM не вернул ни одной вакансии из шорт-листа")
+        return recommended[:30], True
     except Exception as e:
         print("❌ LLM recommendations failed, fallback to comprehensive logic:", e)
-        # Comprehensive fallback: analyze full profile like LLM would
-        
-        # Parse all user data with JSON support
-        def parse_field(field_value):
-            """Parse field that might be JSON array or comma-separated string"""
-            if not field_value:
-                return []
-            try:
-                # Try parsing as JSON first
-                import json
-                parsed = json.loads(field_value)
-                if isinstance(parsed, list):
-                    return [str(item).strip().lower() for item in parsed if item]
-                else:
-                    return [str(parsed).strip().lower()]
-            except:
-                # Fallback to comma-separated parsing
-                return [s.strip().lower() for s in str(field_value).split(",") if s.strip()]
-        
-        user_skills = parse_field(profile.skills)
-        user_industries = parse_field(profile.industries)
-        user_position = (profile.desired_position or "").lower()
-        user_city = (profile.desired_city or "").lower()
-        user_format = (profile.desired_format or "").lower()
-        user_work_time = (profile.desired_work_time or "").lower()
-        user_experience_level = (profile.experience_level or "").lower()
-        
-        # Parse experience and education for additional skills/keywords
-        experience_text = (profile.experience or "").lower()
-        education_text = (profile.education or "").lower()
-        achievements_text = (profile.achievements or "").lower()
-        
-        # Extract additional skills from experience/education
-        additional_keywords = []
-        tech_keywords = ['python', 'javascript', 'java', 'react', 'django', 'sql', 'mongodb', 'aws', 'docker', 'kubernetes', 'machine learning', 'data science', 'frontend', 'backend', 'fullstack', 'api', 'rest', 'microservices']
-        for keyword in tech_keywords:
-            if keyword in experience_text or keyword in education_text or keyword in achievements_text:
-                additional_keywords.append(keyword)
-
-        def comprehensive_relevance_score(job: JobPost) -> tuple:
-            score = 0
-            matches = []
-            job_title = (job.title or "").lower()
-            job_description = (job.description or "").lower()
-            job_location = (job.location or "").lower()
-            job_format = (job.format or "").lower()
-            job_text = f"{job_title} {job_description}"
-            
-            # 1. EXACT POSITION MATCH (weight: 15) - highest priority
-            if user_position and user_position in job_title:
-                score += 15
-                matches.append(f"Точное совпадение должности: {user_position}")
-            elif user_position and any(word in job_title for word in user_position.split() if len(word) > 2):
-                score += 8
-                matches.append(f"Частичное совпадение должности: {user_position}")
-            
-            # 2. SKILLS FROM PROFILE (weight: 4 per skill)
-            skill_matches = [skill for skill in user_skills if skill in job_text]
-            score += len(skill_matches) * 4
-            if skill_matches:
-                matches.append(f"Навыки из профиля: {', '.join(skill_matches[:4])}")
-            
-            # 3. SKILLS FROM EXPERIENCE (weight: 3 per skill)
-            experience_matches = [kw for kw in additional_keywords if kw in job_text]
-            score += len(experience_matches) * 3
-            if experience_matches:
-                matches.append(f"Навыки из опыта: {', '.join(experience_matches[:3])}")
-            
-            # 4. EXPERIENCE LEVEL MATCH (weight: 6)
-            level_keywords = {
-                'junior': ['junior', 'intern', 'entry', 'начинающий', 'стажер'],
-                'middle': ['middle', 'mid', 'experienced', 'опытный'],
-                'senior': ['senior', 'lead', 'старший', 'ведущий', 'главный']
-            }
-            if user_experience_level:
-                for level, keywords in level_keywords.items():
-                    if user_experience_level in keywords:
-                        if any(kw in job_text for kw in level_keywords[level]):
-                            score += 6
-                            matches.append(f"Уровень опыта: {user_experience_level}")
-                        break
-            
-            # 5. INDUSTRY MATCH (weight: 5)
-            industry_matches = [ind for ind in user_industries if ind in job_text]
-            score += len(industry_matches) * 5
-            if industry_matches:
-                matches.append(f"Индустрия: {', '.join(industry_matches[:2])}")
-            
-            # 6. LOCATION MATCH (weight: 4)
-            if user_city and user_city in job_location:
-                score += 4
-                matches.append(f"Город: {user_city}")
-            
-            # 7. FORMAT MATCH (weight: 3)
-            if user_format and user_format in job_format:
-                score += 3
-                matches.append(f"Формат работы: {user_format}")
-            
-            # 8. WORK TIME MATCH (weight: 2)
-            if user_work_time and user_work_time in job_text:
-                score += 2
-                matches.append(f"График работы: {user_work_time}")
-            
-            # 9. BONUS FOR MULTIPLE MATCHES
-            if len(matches) >= 3:
-                score += 2
-                matches.append("Бонус за множественные совпадения")
-                
-            return (score, matches)
-
-        # Score all jobs and sort by relevance
-        job_scores = []
-        for job in jobs:
-            score, matches = comprehensive_relevance_score(job)
-            if score > 0:  # Only include jobs with at least one match
-                job_out = JobPostOut.from_orm(job).dict()
-                job_out["reasons"] = matches
-                job_scores.append((job_out, score))
-        
-        # Sort by score (descending) and return top 30
-        sorted_jobs = sorted(job_scores, key=lambda x: x[1], reverse=True)
-        return [job for job, score in sorted_jobs[:30]]
+        return await local_recommendations(profile, db), False
+
+
+async def local_recommendations(profile: UserProfile, db: AsyncSession) -> list:
+    """Рекомендации без LLM: быстрый локальный скоринг (fallback и первый кадр стриминга)."""
+    # Профиль компилируется в матчер один раз, тексты вакансий нормализуются с кэшем
+    matcher = ProfileMatcher(profile)
+
+    # По умолчанию без LLM — близость TF-IDF векторов профиля и вакансий (один matvec по всем вакансиям)
+    similar = await crud.get_similar_jobs(db, profile, 30)
+    if similar:
+        return [
+            job_with_reasons(job, [f"Похожесть профиля и вакансии: {similarity:.0%}"] + matcher.score(job)[1])
+            for job, similarity in similar
+        ]
+
+    # Векторы не готовы или в профиле нет текста — ключевые совпадения по полям профиля
+    # из БД читаем только вакансии, которые индекс не исключил (score > 0 без совпадений невозможен)
+    jobs = await crud.get_jobs_matching_any(db, matcher.search_patterns())
+
+    # Top 30 by score (descending); причины собираются только для попавших в топ
+    return [job_with_reasons(job, matches) for job, score, matches in matcher.top(jobs, 30)]
+
+
+def ndjson_frame(frame: dict) -> str:
+    return json.dumps(jsonable_encoder(frame), ensure_ascii=False) + "\n"
+
+
+# 🎯 Рекомендации потоком (NDJSON): сначала локальный скоринг, затем ранжирование LLM по мере разбора ответа
+@app.get("/recommendations/stream")
+async def recommend_jobs_stream(user_id: int = Query(...), db: AsyncSession = Depends(get_db)):
+    """
+    Кадры, по одному JSON на строку:
+      {"type": "candidates", "items": [...]}          — быстрый локальный топ (без LLM)
+      {"type": "job", "rank": n, "item": {...}}        — очередная вакансия из ранжирования LLM
+      {"type": "done", "source": "llm"|"local"|"cache", "count": n}
+    Если LLM упал, "done" приходит с source="local" — итоговым остаётся список из "candidates"
+    (такой результат не кэшируется: следующий запрос снова попробует LLM).
+    """
+    profile = await get_user_profile_by_user_id(db, user_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="User profile not found")
+
+    profile_ver = profile_version(profile)
+    jobs_ver = await crud.get_jobs_version(db)
+    cached = recommendation_cache.get(user_id, profile_ver, jobs_ver)
+
+    # всё, что требует БД, делаем до начала ответа: сессия get_db не обязана жить, пока идёт стрим
+    if cached is None:
+        local = await local_recommendations(profile, db)
+        candidates = await crud.retrieve_job_candidates(db, profile)
+        candidate_out = {job.id: JobPostOut.from_orm(job).dict() for job in candidates}
+        profile_dict = trim_profile_for_llm(profile)
+        jobs_dicts = [trim_job_for_llm(job) for job in candidates]
+
+    async def frames():
+        if cached is not None:
+            yield ndjson_frame({"type": "candidates", "items": cached})
+            yield ndjson_frame({"type": "done", "source": "cache", "count": len(cached)})
+            return
+
+        yield ndjson_frame({"type": "candidates", "items": local})
+        recommended = []
+        try:
+            async for rec in stream_recommendations_with_openai(profile_dict, jobs_dicts):
+                job_out = candidate_out.pop(rec.get("id"), None)  # pop: повтор id от модели не дублируем
+                if job_out is None or len(recommended) >= 30:
+                    continue
+                job_out["reasons"] = rec.get("reasons", [])
+                recommended.append(job_out)
+                yield ndjson_frame({"type": "job", "rank": len(recommended), "item": job_out})
+        except Exception as e:
+            print("❌ LLM recommendations stream failed, keeping local ranking:", e)
+            yield ndjson_frame({"type": "done", "source": "local", "count": len(local)})
+            return
+
+        if not recommended:
+            # ни одного разобранного элемента (нет массива, чужие id) — это сбой LLM, а не пустой ответ
+            print("❌ LLM recommendations stream returned no known jobs, keeping local ranking")
+            yield ndjson_frame({"type": "done", "source": "local", "count": len(local)})
+            return
+
+        recommendation_cache.set(user_id, profile_ver, jobs_ver, recommended)
+        yield ndjson_frame({"type": "done", "source": "llm", "count": len(recommended)})
+
+    return StreamingResponse(frames(), media_type="application/x-ndjson")
+
+
+# 🗂️ Индексы вакансий в памяти: инвертированный по токенам и матрица TF-IDF векторов
+# (до готовности поиск и рекомендации работают без них)
+async def build_job_indexes():
+    for index in crud.JOB_MEMORY_INDEXES:
+        try:
+            async with AsyncSessionLocal() as db:
+                await index.sync(db)
+            print(f"🗂️ {type(index).__name__} построен:", index.stats())
+        except Exception as e:
+            print(f"❌ Ошибка при построении {type(index).__name__}:", e)
 
 
 # 🧹 Очистка устаревших вакансий
@@ -337,8 +387,18 @@ async def clean_old_jobs():
         try:
             async with AsyncSessionLocal() as db:
                 cutoff_date = datetime.utcnow() - timedelta(days=30)
-                await db.execute(delete(JobPost).where(JobPost.created_at < cutoff_date))
+                result = await db.execute(delete(JobPost).where(JobPost.created_at < cutoff_date).returning(JobPost.id))
+                deleted_ids = result.scalars().all()
                 await db.commit()
+                if deleted_ids:
+                    recommendation_cache.bump_jobs_version()
+                    crud.unindex_jobs(deleted_ids)
+                evicted = await crud.evict_resume_analysis_cache(db)
+                if evicted:
+                    print(f"🧹 Кэш анализа резюме: удалено {evicted} записей")
+                evicted = await crud.evict_channel_entities(db)
+                if evicted:
+                    print(f"🧹 Кэш проверки каналов: удалено {evicted} просроченных записей")
         except Exception as e:
             print("❌ Ошибка при очистке старых job'ов:", e)
         await asyncio.sleep(86400)
@@ -1,8 +1,20 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR, JSONB
 from app.db import Base
 from datetime import datetime
-from sqlalchemy.orm import relationship
-from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy import ForeignKey, UniqueConstraint, Index
+
+# Полнотекстовый вектор вакансии: title (A), industry (B), description (C),
+# каждое поле и в русской, и в английской морфологии
+JOB_SEARCH_VECTOR_SQL = " || ".join(
+    f"setweight(to_tsvector('{lang}', coalesce({column}, '')), '{weight}')"
+    for column, weight in (("title", "A"), ("industry", "B"), ("description", "C"))
+    for lang in ("russian", "english")
+)
+
+# Колонки, по которым фильтруем через ILIKE '%...%'
+TRGM_COLUMNS = ("title", "industry", "format", "location", "description")
 
 
 class JobPost(Base):
@@ -21,6 +33,23 @@ class JobPost(Base):
     parsed_at = Column(DateTime, default=datetime.utcnow)
     channel_name = Column(String, nullable=True)
     telegram_message_id = Column(Integer, nullable=True)
+    # поддерживается самим Postgres (GENERATED ... STORED), из кода не пишем;
+    # deferred — чтобы обычные SELECT не тащили вектор
+    search_vector = deferred(Column(TSVECTOR, Computed(JOB_SEARCH_VECTOR_SQL, persisted=True)))
+
+    __table_args__ = (
+        # одна вакансия на сообщение канала; цель для INSERT ... ON CONFLICT
+        Index("uq_job_posts_channel_message", "channel_name", "telegram_message_id", unique=True),
+        # keyset-пагинация: ORDER BY created_at DESC, id DESC
+        Index("ix_job_posts_created_at_id", "created_at", "id"),
+        Index("ix_job_posts_search_vector", "search_vector", postgresql_using="gin"),
+        # триграммы (pg_trgm) для ILIKE '%...%' в search_jobs / recommend_jobs_for_user
+        *(
+            Index(f"ix_job_posts_{column}_trgm", column, postgresql_using="gin",
+                  postgresql_ops={column: "gin_trgm_ops"})
+            for column in TRGM_COLUMNS
+        ),
+    )
 
 
 class UserProfile(Base):
@@ -82,3 +111,40 @@ class UserTelegramChannel(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     channel_username = Column(String, nullable=False)
+
+
+class ChannelSyncState(Base):
+    """Последнее обработанное ингестером сообщение канала (high-water mark для min_id)."""
+    __tablename__ = "channel_sync_state"
+
+    channel_name = Column(String, primary_key=True)
+    last_message_id = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ResumeAnalysisCache(Base):
+    """Результат анализа резюме LLM по хешу текста и версии промпта — повторная загрузка того же PDF без LLM."""
+    __tablename__ = "resume_analysis_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256(версия промпта + нормализованный текст)
+    prompt_version = Column(String, nullable=False)
+    result = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    accessed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    hits = Column(Integer, default=0, nullable=False)
+
+
+class TelegramChannelEntity(Base):
+    """
+    Результат проверки канала в Telegram по username: id и access_hash для запросов без
+    повторного resolve, либо отрицательный ответ (private / invalid / not_channel) с коротким сроком жизни.
+    """
+    __tablename__ = "telegram_channel_entities"
+
+    username = Column(String, primary_key=True)  # в нижнем регистре, без @
+    status = Column(String, nullable=False)      # public | private | invalid | not_channel
+    channel_id = Column(BigInteger, nullable=True)
+    access_hash = Column(BigInteger, nullable=True)
+    title = Column(String, nullable=True)
+    resolved_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_db
+from app.db import get_db, AsyncSessionLocal
 from app.schemas import UserRegister, UserLogin, UserOut, UserProfileCreate, UserCreate
 from app.crud import create_user, get_user_by_email_or_phone, verify_password, create_user_profile
 from app.models import User
+from app.utils.passwords import password_hasher
+from app.utils.principals import principal_cache, UserPrincipal
 from fastapi import status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
 import os
+import secrets
 from dotenv import load_dotenv
 
 # --- JWT Settings ---
@@ -22,6 +25,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 # --- End JWT Settings ---
 
+# Общий секрет бэкенда и ингестера для служебных эндпоинтов: шлюз Telegram, отметки каналов, запись вакансий
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
 router = APIRouter()
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
@@ -45,57 +51,82 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+def create_user_access_token(user: User) -> str:
+    # только sub и iat (добавляет create_access_token): get_current_user строит пользователя без БД
+    return create_access_token(
+        data={"sub": str(user.id)},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserPrincipal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+    payload = principal_cache.get_payload(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = await db.get(User, int(user_id))
-    if user is None:
-        raise credentials_exception
-    return user
+        user_id = payload.get("sub")
+        if user_id is None or not str(user_id).isdigit():
+            raise credentials_exception
+        principal_cache.set_payload(token, payload)
+
+    principal = principal_cache.from_token_claims(payload)
+    if principal is not None:
+        return principal
+
+    user_id = int(payload["sub"])
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        # сессия открывается только на промахе кэша
+        async with AsyncSessionLocal() as db:
+            user = await db.get(User, user_id)
+        if user is None:
+            raise credentials_exception
+        principal = UserPrincipal.from_user(user)
+        principal_cache.set(principal)
+    return principal
 # --- End JWT Functions ---
 
+async def require_internal_token(x_internal_token: Optional[str] = Header(None)):
+    # без настроенного токена эндпоинты закрыты, а не открыты всем
+    if not INTERNAL_API_TOKEN or not x_internal_token or not secrets.compare_digest(x_internal_token, INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Internal endpoint")
+
 @router.post("/token")
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     user = await get_user_by_email_or_phone(db, email=form_data.username, phone=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(db, user, form_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
-    )
+    access_token = create_user_access_token(user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login")
 async def login(data: UserLogin, db: AsyncSession = Depends(get_db)):
     user = await get_user_by_email_or_phone(db, email=data.email, phone=data.phone)
-    if not user or not verify_password(data.password, user.hashed_password):
+    if not user or not await verify_password(db, user, data.password):
         raise HTTPException(status_code=401, detail="Неверные учетные данные")
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
-    )
+    access_token = create_user_access_token(user)
     return {"access_token": access_token, "token_type": "bearer", "user_id": user.id}
 
+@router.get("/auth/metrics")
+async def auth_metrics():
+    # cost factor bcrypt, загрузка пула хеширования паролей и кэш пользователей по токенам
+    return {"password_hashing": password_hasher.stats(), "principal_cache": principal_cache.stats()}
+
 @router.post("/logout")
 async def logout():
     # Если будет сессия/токен — тут удалять
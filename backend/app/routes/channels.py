@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Dict, List, Optional
 
 from app import schemas, models, crud
 from app.db import get_db
-from app.routes.auth import get_current_user
-from app.utils.telegram_client import telegram_client
-from telethon.errors import ChannelInvalidError, ChannelPrivateError
+from app.routes.auth import get_current_user, require_internal_token
+from app.utils.principals import UserPrincipal
+from app.utils.telegram_client import telegram_gateway
+from common.telegram_gateway import entity_info
+from telethon.errors import (
+    ChannelInvalidError, ChannelPrivateError, FloodWaitError, UsernameInvalidError, UsernameNotOccupiedError,
+)
+from telethon.tl.types import InputPeerChannel
 import asyncio
 
 router = APIRouter(
@@ -16,24 +23,58 @@ router = APIRouter(
 
 MAX_CHANNELS_PER_USER = 3
 
+
+def channel_key(username: str) -> str:
+    return username.strip().lstrip("@").lower()
+
+
+async def resolve_channel_entity(db: AsyncSession, username: str) -> dict:
+    """
+    Проверка канала через кэш telegram_channel_entities: в Telegram идём только на промахе.
+    Закрытый или несуществующий канал тоже кэшируется (ненадолго), сбои связи и FloodWait — нет.
+    """
+    key = channel_key(username)
+    cached = await crud.get_channel_entity(db, key)
+    if cached is not None:
+        return dict(cached)
+    try:
+        entity = await telegram_gateway.resolve(key)
+    except ChannelPrivateError:
+        return await crud.save_channel_entity(db, key, "private")
+    except (ChannelInvalidError, UsernameInvalidError, UsernameNotOccupiedError, ValueError):
+        # ValueError — так Telethon сообщает, что username никому не принадлежит
+        return await crud.save_channel_entity(db, key, "invalid")
+    except FloodWaitError as e:
+        raise HTTPException(
+            status_code=429, detail="Telegram просит подождать, попробуйте позже",
+            headers={"Retry-After": str(e.seconds)},
+        )
+    except RuntimeError as e:  # сессия Telegram не авторизована
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to validate channel: {str(e)}")
+    info = entity_info(entity)
+    return await crud.save_channel_entity(db, key, info["status"], info["channel_id"], info["access_hash"], info["title"])
+
 @router.post("/", response_model=schemas.UserTelegramChannelOut, status_code=status.HTTP_201_CREATED)
 async def add_user_channel(
     channel: schemas.UserTelegramChannelCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     # Проверяем, не превышен ли лимит каналов
-    if len(current_user.channels) >= MAX_CHANNELS_PER_USER:
+    if len(await crud.get_user_channels(db, current_user.id)) >= MAX_CHANNELS_PER_USER:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"You can add a maximum of {MAX_CHANNELS_PER_USER} channels.",
         )
 
     # Проверяем, не добавлен ли уже такой канал
-    existing_channel = db.query(models.UserTelegramChannel).filter(
+    result = await db.execute(select(models.UserTelegramChannel).where(
         models.UserTelegramChannel.user_id == current_user.id,
         models.UserTelegramChannel.channel_username == channel.channel_username
-    ).first()
+    ))
+    existing_channel = result.scalars().first()
 
     if existing_channel:
         raise HTTPException(
@@ -42,49 +83,111 @@ async def add_user_channel(
         )
 
     # Validate channel existence and public status
-    try:
-        if not telegram_client.is_connected():
-            await telegram_client.connect()
-        entity = await telegram_client.get_entity(channel.channel_username)
-    except ChannelInvalidError:
+    entity = await resolve_channel_entity(db, channel.channel_username)
+    if entity["status"] == "invalid":
         raise HTTPException(status_code=400, detail="Channel is invalid or does not exist.")
-    except ChannelPrivateError:
+    if entity["status"] == "private":
         raise HTTPException(status_code=400, detail="Channel is private and cannot be added.")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to validate channel: {str(e)}")
-    finally:
-        if telegram_client.is_connected():
-            await telegram_client.disconnect()
+    if entity["status"] == "not_channel":
+        raise HTTPException(status_code=400, detail="This username belongs to a user or bot, not a channel.")
 
     db_channel = models.UserTelegramChannel(
         user_id=current_user.id,
         channel_username=channel.channel_username
     )
     db.add(db_channel)
-    db.commit()
-    db.refresh(db_channel)
+    await db.commit()
+    await db.refresh(db_channel)
     return db_channel
 
 @router.get("/", response_model=List[schemas.UserTelegramChannelOut])
 async def get_user_channels(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
-    return current_user.channels
+    return await crud.get_user_channels(db, current_user.id)
 
 @router.get("/internal/all", response_model=List[str])
-async def get_all_channels(db: Session = Depends(get_db)):
+async def get_all_channels(db: AsyncSession = Depends(get_db)):
     return await crud.get_all_unique_channels(db)
 
+@router.get("/internal/sync_state", response_model=Dict[str, int], dependencies=[Depends(require_internal_token)])
+async def get_sync_state(db: AsyncSession = Depends(get_db)):
+    return await crud.get_channel_sync_state(db)
+
+@router.put(
+    "/internal/sync_state/{channel_name}",
+    response_model=schemas.ChannelSyncStateUpdate,
+    dependencies=[Depends(require_internal_token)],
+)
+async def set_sync_state(
+    channel_name: str,
+    state: schemas.ChannelSyncStateUpdate,
+    db: AsyncSession = Depends(get_db),
+):
+    last_message_id = await crud.set_channel_sync_state(db, channel_name, state.last_message_id)
+    return {"last_message_id": last_message_id}
+
+# Шлюз Telegram для ингестера: сессией владеет бэкенд, ингестер своего клиента не открывает.
+# Каналы проверяются через тот же кэш, что и при добавлении пользователем
+async def resolve_public_channel(db: AsyncSession, channel_name: str) -> dict:
+    entity = await resolve_channel_entity(db, channel_name)
+    if entity["status"] != "public":
+        raise HTTPException(status_code=404, detail=f"Channel is {entity['status']}")
+    return entity
+
+def channel_peer(entity: dict):
+    # id + access_hash из кэша избавляют Telethon от resolve по username
+    return InputPeerChannel(entity["channel_id"], entity["access_hash"]) if entity["access_hash"] else entity["username"]
+
+@router.get("/internal/telegram/entity/{channel_name}", dependencies=[Depends(require_internal_token)])
+async def resolve_telegram_channel(channel_name: str, db: AsyncSession = Depends(get_db)):
+    return await resolve_public_channel(db, channel_name)
+
+@router.get("/internal/telegram/messages/{channel_name}", dependencies=[Depends(require_internal_token)])
+async def fetch_telegram_messages(
+    channel_name: str,
+    min_id: int = 0,
+    offset_date: Optional[datetime] = None,
+    reverse: bool = False,
+    limit: int = Query(100, ge=1),
+    db: AsyncSession = Depends(get_db),
+):
+    entity = await resolve_public_channel(db, channel_name)
+    try:
+        try:
+            messages = await telegram_gateway.fetch_messages(channel_peer(entity), min_id, offset_date, reverse, limit)
+        except ChannelInvalidError:
+            if not entity["access_hash"]:
+                raise
+            # access_hash из кэша устарел (например, сессию перелогинили другим аккаунтом):
+            # забываем запись и один раз пробуем заново через resolve по username
+            await crud.delete_channel_entity(db, entity["username"])
+            entity = await resolve_public_channel(db, channel_name)
+            messages = await telegram_gateway.fetch_messages(channel_peer(entity), min_id, offset_date, reverse, limit)
+    except ChannelPrivateError as e:
+        # канал закрыли после проверки — запоминаем, чтобы не дёргать Telegram до истечения записи
+        await crud.save_channel_entity(db, entity["username"], "private")
+        raise HTTPException(status_code=404, detail=str(e))
+    except (ChannelInvalidError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FloodWaitError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.seconds)})
+    except RuntimeError as e:  # сессия не авторизована
+        raise HTTPException(status_code=503, detail=str(e))
+    return [message.public() for message in messages]
+
+@router.get("/internal/telegram/stats", dependencies=[Depends(require_internal_token)])
+async def telegram_gateway_stats():
+    return telegram_gateway.stats()
+
 @router.delete("/{channel_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user_channel(
     channel_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
-    db_channel = db.query(models.UserTelegramChannel).filter(
-        models.UserTelegramChannel.id == channel_id
-    ).first()
+    db_channel = await db.get(models.UserTelegramChannel, channel_id)
 
     if not db_channel:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Channel not found")
@@ -95,6 +198,6 @@ async def delete_user_channel(
             detail="You do not have permission to delete this channel.",
         )
 
-    db.delete(db_channel)
-    db.commit()
+    await db.delete(db_channel)
+    await db.commit()
     return None 
\ No newline at end of file
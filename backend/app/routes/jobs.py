@@ -1,24 +1,72 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, HTTPException
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Any, Dict, List, Optional
 
 from app import schemas, crud
-from app.schemas import JobPostOut, JobPostCreate
-from app.crud import create_or_update_job_post
+from app.schemas import JobPostOut, JobPostCreate, JobPostPage, JobPostBatchResult, ExistingJobsQuery
+from app.crud import create_or_update_job_post, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, MAX_BATCH_SIZE
 from app.db import get_db
+from app.routes.auth import require_internal_token
+from app.utils.pagination import decode_cursor
 
 router = APIRouter()
 
+
+def parse_cursor(cursor: Optional[str] = Query(None)):
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 # 📌 Вакансии
 @router.post("/jobs", response_model=JobPostOut)
 async def create_job(job: JobPostCreate, db: AsyncSession = Depends(get_db)):
     return await create_or_update_job_post(db, job)
 
-@router.get("/jobs", response_model=List[JobPostOut])
-async def read_jobs(db: AsyncSession = Depends(get_db)):
-    return await crud.get_all_jobs(db)
+@router.post("/jobs/batch", response_model=JobPostBatchResult, dependencies=[Depends(require_internal_token)])
+async def create_jobs_batch(
+    items: List[Dict[str, Any]],
+    on_conflict: str = Query("ignore", pattern="^(ignore|update)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Элементы валидируются по одному: вакансия с негодным полем (поле извлекал LLM) попадает в rejected,
+    а не отклоняет всю пачку с 422.
+    """
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {MAX_BATCH_SIZE} jobs")
+    jobs, rejected = [], []
+    for index, item in enumerate(items):
+        try:
+            jobs.append(JobPostCreate.model_validate(item))
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            rejected.append({"index": index, "error": errors})
+    written = await crud.bulk_upsert_job_posts(db, jobs, update=on_conflict == "update")
+    return {"received": len(items), "written": written, "rejected": rejected}
+
+@router.post("/jobs/existing", response_model=List[int], dependencies=[Depends(require_internal_token)])
+async def existing_jobs(query: ExistingJobsQuery, db: AsyncSession = Depends(get_db)):
+    """Какие из message_ids канала уже есть в job_posts — ингестер пропускает их до вызова LLM."""
+    if len(query.message_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {MAX_BATCH_SIZE} ids")
+    return await crud.get_existing_message_ids(db, query.channel_name, query.message_ids)
+
+@router.get("/jobs", response_model=JobPostPage)
+async def read_jobs(
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor=Depends(parse_cursor),
+):
+    try:
+        items, next_cursor = await crud.get_all_jobs(db, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": items, "next_cursor": next_cursor}
 
-@router.get("/jobs/search", response_model=List[JobPostOut])
+@router.get("/jobs/search", response_model=JobPostPage)
 async def search_jobs(
     db: AsyncSession = Depends(get_db),
     salary_min: int = Query(None),
@@ -26,12 +74,24 @@ async def search_jobs(
     title: str = Query(None),
     format: str = Query(None),
     location: str = Query(None),
+    q: str = Query(None, description="Свободный текст, результаты сортируются по релевантности"),
+    search_mode: str = Query("fts", pattern="^(fts|ilike)$"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor=Depends(parse_cursor),
 ):
-    return await crud.search_jobs(
-        db,
-        salary_min=salary_min,
-        industry=industry,
-        title=title,
-        format=format,
-        location=location,
-    ) 
\ No newline at end of file
+    try:
+        items, next_cursor = await crud.search_jobs(
+            db,
+            salary_min=salary_min,
+            industry=industry,
+            title=title,
+            format=format,
+            location=location,
+            q=q,
+            search_mode=search_mode,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": items, "next_cursor": next_cursor}
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 
 # =====================
@@ -32,6 +32,27 @@ class JobPostOut(JobPostBase):
         from_attributes = True
 
 
+class ExistingJobsQuery(BaseModel):
+    channel_name: str
+    message_ids: List[int]
+
+
+class JobPostRejected(BaseModel):
+    index: int      # позиция вакансии в присланном списке
+    error: str
+
+
+class JobPostBatchResult(BaseModel):
+    received: int   # сколько вакансий пришло в запросе
+    written: int    # сколько реально вставлено/обновлено
+    rejected: List[JobPostRejected] = []  # не прошли валидацию и не записаны
+
+
+class JobPostPage(BaseModel):
+    items: List[JobPostOut]
+    next_cursor: Optional[str] = None  # None — больше страниц нет
+
+
 # =====================
 # ➕ USER TELEGRAM CHANNEL
 # =====================
@@ -48,6 +69,10 @@ class UserTelegramChannelOut(UserTelegramChannelBase):
         from_attributes = True
 
 
+class ChannelSyncStateUpdate(BaseModel):
+    last_message_id: int
+
+
 # =====================
 # 👤 USER PROFILE
 # =====================
@@ -4,17 +4,34 @@ import openai
 import re
 from dotenv import load_dotenv
 from fastapi import HTTPException
+from common.llm_rate_limiter import llm_rate_limiter, estimate_tokens
+from common.text_hash import cache_key
+from app.utils.json_stream import JsonArrayItems
+from app.utils.recommend import RECOMMEND_LLM_TOP, RECOMMEND_TOKENS_PER_ITEM
 
 load_dotenv()
 
-client = openai.AzureOpenAI(
+# Таймаут одного запроса к LLM, сек — чтобы зависший вызов не держал HTTP-запрос пользователя вечно
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Асинхронный клиент: пока ждём модель, воркер uvicorn обслуживает другие запросы
+client = openai.AsyncAzureOpenAI(
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
     api_version="2024-02-15-preview",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
+    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    timeout=LLM_TIMEOUT,
+    max_retries=0,  # повторы на 429 делает llm_rate_limiter
 )
 
 DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT")  # Например: "gpt-35-turbo"
 
+# Версия промпта анализа резюме: меняем при правке промпта — кэш старых ответов перестанет совпадать
+RESUME_PROMPT_VERSION = "1"
+
+
+def resume_analysis_key(text: str) -> str:
+    return cache_key(text, RESUME_PROMPT_VERSION)
+
 def extract_json_from_response(text: str) -> dict:
     try:
         json_str = re.search(r"\{.*\}", text, re.DOTALL).group()
@@ -23,7 +40,7 @@ def extract_json_from_response(text: str) -> dict:
         print("❌ Ошибка JSON:", e)
         raise HTTPException(status_code=500, detail="OpenAI вернул невалидный JSON")
 
-def analyze_resume_with_openai(text: str) -> dict:
+async def analyze_resume_with_openai(text: str) -> dict:
     prompt = f"""
 Ты — AI-ассистент, который структурирует резюме для HR-системы. Твоя задача — максимально точно извлечь данные по каждому из следующих полей. Если по какому-то полю нет информации — не включай его в JSON вообще (не пиши 'string', 'null', 'none', '0' и т.п.).
 
@@ -89,7 +106,9 @@ def analyze_resume_with_openai(text: str) -> dict:
 """  # Твой длинный промпт оставь без изменений
 
     try:
-        response = client.chat.completions.create(
+        response = await llm_rate_limiter.acall(
+            client.chat.completions.create,
+            estimated_tokens=estimate_tokens(prompt) + 2000,
             model=DEPLOYMENT_NAME,
             messages=[
                 {"role": "system", "content": "Ты структурируешь резюме в JSON формате строго по заданному шаблону."},
@@ -105,12 +124,7 @@ def analyze_resume_with_openai(text: str) -> dict:
         print("❌ Azure OpenAI API error:", e)
         raise HTTPException(status_code=500, detail="Ошибка при обращении к Azure OpenAI API")
 
-def recommend_jobs_with_openai(profile: dict, jobs: list) -> list:
-    """
-    Использует Azure OpenAI для выбора наиболее подходящих вакансий для пользователя и объяснения причин.
-    На входе: profile (dict) — профиль пользователя, jobs (list) — список вакансий (dict).
-    На выходе: список рекомендованных вакансий с причинами (list of dict: {job, reasons})
-    """
+def build_recommend_prompt(profile: dict, jobs: list) -> str:
     prompt = f"""
 Ты — AI-эксперт по подбору вакансий. Тебе дан ПОЛНЫЙ профиль пользователя (резюме + предпочтения) и список вакансий. Твоя задача — провести глубокий анализ совместимости и отсортировать вакансии по релевантности.
 
@@ -170,15 +184,15 @@ def recommend_jobs_with_openai(profile: dict, jobs: list) -> list:
 - Анализируй ВСЕ поля профиля, не только desired_*
 - Учитывай синонимы и смежные технологии (React ≈ JavaScript, Python ≈ Django)
 - Сравнивай уровень опыта с требованиями вакансии
-- Возвращай ВСЕ вакансии с score ≥ 1
+- Возвращай только {RECOMMEND_LLM_TOP} лучших вакансий с score ≥ 1, не больше
 - Сортируй строго по убыванию score
-- Для каждой вакансии дай КОНКРЕТНЫЕ объяснения совпадений
+- Для каждой вакансии дай 1–2 КОНКРЕТНЫЕ и короткие (до 80 символов) причины совпадения
 
 Профиль пользователя:
-{json.dumps(profile, ensure_ascii=False, indent=2)}
+{json.dumps(profile, ensure_ascii=False, indent=2, default=str)}
 
 Список вакансий:
-{json.dumps(jobs, ensure_ascii=False, indent=2)}
+{json.dumps(jobs, ensure_ascii=False, indent=2, default=str)}
 
 Ответ верни в формате JSON (отсортированный по score от 5 до 1):
 [
@@ -186,25 +200,40 @@ def recommend_jobs_with_openai(profile: dict, jobs: list) -> list:
     "id": <id вакансии>,
     "match_score": <число от 1 до 5>,
     "reasons": [
-      "Навыки: совпадают Python, Django (из skills)",
-      "Опыт: 3 года backend разработки (из experience)", 
-      "Должность: ищет Backend Developer, вакансия Python Developer",
-      "Город: желает Алматы, вакансия в Алматы",
-      "Уровень: middle опыт подходит под требования"
+      "Навыки: совпадают Python, Django",
+      "Должность: ищет Backend Developer, вакансия Python Developer"
     ]
   }}, ...
 ]
 """
+    return prompt
+
+
+def recommend_request(profile: dict, jobs: list) -> dict:
+    """Параметры chat.completions.create для рекомендаций (общие для обычного и стримингового вызова)."""
+    prompt = build_recommend_prompt(profile, jobs)
+    # ответ растёт с числом вакансий в нём — обрезанный JSON не разберётся и уведёт в fallback
+    max_tokens = 200 + RECOMMEND_TOKENS_PER_ITEM * min(len(jobs), RECOMMEND_LLM_TOP)
+    return dict(
+        estimated_tokens=estimate_tokens(prompt) + max_tokens,
+        model=DEPLOYMENT_NAME,
+        messages=[
+            {"role": "system", "content": "Ты помогаешь рекомендовать вакансии по профилю пользователя. Отвечай строго в формате JSON."},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.2,
+        max_tokens=max_tokens,
+    )
+
+
+async def recommend_jobs_with_openai(profile: dict, jobs: list) -> list:
+    """
+    Использует Azure OpenAI для выбора наиболее подходящих вакансий для пользователя и объяснения причин.
+    На входе: profile (dict) — профиль пользователя, jobs (list) — список вакансий (dict).
+    На выходе: список рекомендованных вакансий с причинами (list of dict: {job, reasons})
+    """
     try:
-        response = client.chat.completions.create(
-            model=DEPLOYMENT_NAME,
-            messages=[
-                {"role": "system", "content": "Ты помогаешь рекомендовать вакансии по профилю пользователя. Отвечай строго в формате JSON."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.2,
-            max_tokens=2000,
-        )
+        response = await llm_rate_limiter.acall(client.chat.completions.create, **recommend_request(profile, jobs))
         raw_text = response.choices[0].message.content
         print("📥 Ответ от Azure OpenAI (recommend):", raw_text)
         return json.loads(raw_text)
@@ -212,3 +241,19 @@ def recommend_jobs_with_openai(profile: dict, jobs: list) -> list:
         print("❌ Azure OpenAI API error (recommend):", e)
         raise HTTPException(status_code=500, detail="Ошибка при обращении к Azure OpenAI API (recommend)")
 
+
+async def stream_recommendations_with_openai(profile: dict, jobs: list):
+    """
+    То же, что recommend_jobs_with_openai, но со стримингом: асинхронный генератор отдаёт
+    {"id", "match_score", "reasons"} по одному, как только объект закрылся в потоке ответа.
+    """
+    stream = await llm_rate_limiter.acall(client.chat.completions.create, stream=True, **recommend_request(profile, jobs))
+    parser = JsonArrayItems()
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            for item in parser.feed(delta):
+                yield item
+
@@ -0,0 +1,172 @@
+import os
+import re
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from sqlalchemy import select
+
+from app.models import JobPost
+
+# Поля вакансии, токены которых попадают в индекс
+INDEXED_FIELDS = ("title", "description", "industry", "location", "format")
+
+# Кандидатов больше этого — сужение не имеет смысла, пусть Postgres сканирует сам
+JOB_INDEX_MAX_CANDIDATES = int(os.getenv("JOB_INDEX_MAX_CANDIDATES", "5000"))
+# Сколько раскрытий подстрока -> токены словаря держим в памяти
+JOB_INDEX_EXPANSION_CACHE = int(os.getenv("JOB_INDEX_EXPANSION_CACHE", "10000"))
+
+TOKEN_RE = re.compile(r"\w+")
+# Спецсимволы LIKE: с ними паттерн — не подстрока, а шаблон, и куски \w+ не обязаны быть в тексте
+LIKE_SPECIAL = ("%", "_", "\\")
+
+
+def tokenize(text: str) -> set:
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+class JobTextIndex:
+    """
+    Инвертированный индекс по тексту вакансий в памяти процесса: токен -> отсортированный array id.
+
+    Индекс только сужает выборку, окончательную проверку делает тот же код, что и без него
+    (ILIKE в Postgres, ProfileMatcher в fallback-рекомендациях). Поэтому candidates() обязан
+    вернуть надмножество вакансий, где паттерн встречается как подстрока (как `in` / ILIKE):
+    каждый непрерывный кусок \\w+ паттерна в тексте целиком лежит внутри какого-то токена,
+    значит вакансия есть в объединении постингов токенов, содержащих этот кусок.
+    None — «сузить нельзя, смотрите всё».
+    """
+
+    def __init__(self):
+        self._postings = {}     # token -> array('I') с id по возрастанию
+        self._doc_tokens = {}   # job_id -> tuple(tokens), нужен для удаления/переиндексации
+        self._vocab = []        # все токены, когда-либо попадавшие в индекс, в порядке появления
+        self._expansions = {}   # кусок паттерна -> (токены словаря, содержащие его; сколько словаря просмотрено)
+        self.max_id = 0
+        self.ready = False
+        self.built_in = None
+
+    # ---------- обновление ----------
+
+    def add(self, job_id: int, *texts):
+        if job_id in self._doc_tokens:
+            self.remove([job_id])
+        tokens = set()
+        for text in texts:
+            if text:
+                tokens |= tokenize(text)
+        self._doc_tokens[job_id] = tuple(tokens)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = array("I")
+                self._vocab.append(token)
+            if not postings or postings[-1] < job_id:
+                postings.append(job_id)  # обычный случай: id растут
+            else:
+                insort(postings, job_id)
+        self.max_id = max(self.max_id, job_id)
+
+    def add_many(self, rows):
+        for row in rows:
+            self.add(*row)
+
+    def add_job(self, job):
+        self.add(job.id, *(getattr(job, field) for field in INDEXED_FIELDS))
+
+    def remove(self, job_ids):
+        removed = set()
+        affected = set()
+        for job_id in job_ids:
+            tokens = self._doc_tokens.pop(job_id, None)
+            if tokens is not None:
+                removed.add(job_id)
+                affected.update(tokens)
+        for token in affected:
+            postings = self._postings[token]
+            if len(removed) == 1:
+                (job_id,) = removed
+                del postings[bisect_left(postings, job_id)]
+            else:
+                self._postings[token] = array("I", (i for i in postings if i not in removed))
+        return len(removed)
+
+    async def sync(self, db):
+        """Догружает вакансии с id > max_id. При старте — полное построение индекса."""
+        started = time.perf_counter()
+        stmt = (
+            select(JobPost.id, *(getattr(JobPost, field) for field in INDEXED_FIELDS))
+            .where(JobPost.id > self.max_id)
+            .order_by(JobPost.id)
+        )
+        added = 0
+        result = await db.stream(stmt)
+        async for rows in result.partitions(5000):
+            self.add_many(rows)
+            added += len(rows)
+        if not self.ready:
+            self.ready = True
+            self.built_in = time.perf_counter() - started
+        return added
+
+    # ---------- поиск ----------
+
+    def _expand(self, piece: str) -> list:
+        tokens, scanned = self._expansions.get(piece, ((), 0))
+        if scanned < len(self._vocab):
+            # словарь только растёт — досматриваем лишь новые токены
+            tokens = list(tokens) + [t for t in self._vocab[scanned:] if piece in t]
+            if len(self._expansions) >= JOB_INDEX_EXPANSION_CACHE:
+                self._expansions.clear()
+            self._expansions[piece] = (tokens, len(self._vocab))
+        return tokens
+
+    def _pattern_candidates(self, pattern: str, limit: int):
+        pieces = TOKEN_RE.findall(pattern.lower())
+        if not pieces:
+            return None  # пустой паттерн или одна пунктуация — встречается где угодно
+        result = None
+        # с самых длинных кусков: у них короче постинги, пересечение быстрее схлопывается
+        for piece in sorted(set(pieces), key=len, reverse=True):
+            postings = [self._postings[token] for token in self._expand(piece)]
+            if len(pieces) == 1 and any(len(p) > limit for p in postings):
+                return None  # кандидатов заведомо больше лимита — не тратим время на объединение
+            ids = set()
+            for p in postings:
+                ids.update(p)
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result
+
+    def candidates(self, patterns, like: bool = False):
+        """
+        id вакансий, где может встретиться хотя бы один из паттернов, или None.
+        like=True — паттерны пойдут в ILIKE: шаблоны с % и _ индекс не сужает.
+        """
+        if not self.ready:
+            return None
+        if like and any(char in pattern for pattern in patterns for char in LIKE_SPECIAL):
+            return None
+        found = set()
+        for pattern in patterns:
+            ids = self._pattern_candidates(pattern, JOB_INDEX_MAX_CANDIDATES)
+            if ids is None:
+                return None
+            found |= ids
+            if len(found) > JOB_INDEX_MAX_CANDIDATES:
+                return None
+        return found
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "jobs": len(self._doc_tokens),
+            "tokens": len(self._postings),
+            "postings": sum(len(p) for p in self._postings.values()),
+            "max_id": self.max_id,
+            "built_in": self.built_in,
+        }
+
+
+job_index = JobTextIndex()
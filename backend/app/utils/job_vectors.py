@@ -0,0 +1,221 @@
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+from sqlalchemy import select
+
+from app.models import JobPost
+from app.utils.job_index import INDEXED_FIELDS
+from app.utils.recommend import parse_profile_list
+
+# Размерность хешированных векторов; матрица вакансий занимает jobs * VECTOR_DIM * 4 байта
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", "512"))
+# Ниже этой косинусной близости вакансия в рекомендации не попадает
+VECTOR_MIN_SCORE = float(os.getenv("VECTOR_MIN_SCORE", "0.05"))
+
+WORD_RE = re.compile(r"\w+")
+# Заголовок и навыки важнее описания: их признаки учитываем с этим весом
+TITLE_WEIGHT = 2.0
+# Слова длиннее STEM_LEN дают ещё и признак-префикс: разработчик/разработчика -> «разраб»
+STEM_LEN = 6
+
+
+def features(text: str) -> list:
+    words = [word for word in WORD_RE.findall(text.lower()) if len(word) > 1]
+    return words + [word[:STEM_LEN] + "~" for word in words if len(word) > STEM_LEN]
+
+
+def term_weights(weighted_texts) -> dict:
+    """признак -> суммарный вес вхождений (tf с учётом веса поля)."""
+    tf = {}
+    for text, weight in weighted_texts:
+        if text:
+            for feature, count in Counter(features(text)).items():
+                tf[feature] = tf.get(feature, 0.0) + count * weight
+    return tf
+
+
+def job_terms(texts) -> dict:
+    fields = dict(zip(INDEXED_FIELDS, texts))
+    return term_weights([
+        (fields.get("title"), TITLE_WEIGHT),
+        (fields.get("description"), 1.0),
+        (fields.get("industry"), 1.0),
+    ])
+
+
+def profile_terms(profile) -> dict:
+    skills = " ".join(parse_profile_list(profile.skills))
+    industries = " ".join(parse_profile_list(profile.industries))
+    return term_weights([
+        (profile.resume_text, 1.0),
+        (skills, TITLE_WEIGHT),
+        (profile.desired_position, TITLE_WEIGHT),
+        (industries, 1.0),
+    ])
+
+
+class JobVectorIndex:
+    """
+    TF-IDF вакансий, спроецированный signed feature hashing в VECTOR_DIM измерений:
+    одна float32-матрица с L2-нормированными строками в памяти процесса.
+    Близость профиля ко всем вакансиям — одно матрично-векторное произведение.
+
+    IDF считается по признакам (до хеширования — иначе при плотных корзинах он вырождается в 1).
+    df и число документов только растут: удалённые вакансии из статистики не вычитаются,
+    отношение df/N от этого почти не меняется. Хеш — встроенный hash(): векторы живут только
+    в памяти процесса, где и считаются, так что соль PYTHONHASHSEED не мешает.
+    Интерфейс обновления тот же, что у JobTextIndex: add(job_id, *texts), remove(ids), sync(db).
+    """
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        self.dim = dim
+        self._matrix = np.zeros((1024, dim), dtype=np.float32)
+        self._ids = np.zeros(1024, dtype=np.int64)
+        self._rows = {}  # job_id -> строка матрицы
+        self._size = 0
+        self._df = {}    # признак -> в скольких вакансиях встречался
+        self._docs = 0
+        self.max_id = 0
+        self.ready = False
+        self.built_in = None
+
+    def vectorize_many(self, tfs: list) -> np.ndarray:
+        """
+        Нормированные TF-IDF векторы (сублинейный tf) в хешированном пространстве, по строке на tf.
+        Вся пачка собирается одним bincount по плоским индексам row * dim + корзина.
+        """
+        # признаки пачки -> локальные номера; хеш, знак и IDF считаем один раз на признак
+        vocab = {}
+        feature_ids, tf_weights, lengths = [], [], []
+        for tf in tfs:
+            for feature, weight in tf.items():
+                fid = vocab.get(feature)
+                if fid is None:
+                    fid = vocab[feature] = len(vocab)
+                feature_ids.append(fid)
+                tf_weights.append(weight)
+            lengths.append(len(tf))
+        hashes = np.fromiter((hash(f) for f in vocab), dtype=np.int64, count=len(vocab))
+        df = np.fromiter((self._df.get(f, 0) for f in vocab), dtype=np.float64, count=len(vocab))
+        signed_idf = (np.log((self._docs + 1) / (1.0 + df)) + 1.0) * np.where((hashes >> 32) & 1, 1.0, -1.0)
+
+        feature_ids = np.asarray(feature_ids, dtype=np.int64)
+        rows = np.repeat(np.arange(len(tfs), dtype=np.int64), lengths)
+        weights = (1.0 + np.log(np.asarray(tf_weights, dtype=np.float64))) * signed_idf[feature_ids]
+        vectors = np.bincount(
+            rows * self.dim + hashes[feature_ids] % self.dim, weights=weights, minlength=len(tfs) * self.dim,
+        ).astype(np.float32).reshape(len(tfs), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def vectorize(self, tf: dict) -> np.ndarray:
+        return self.vectorize_many([tf])[0]
+
+    # ---------- обновление ----------
+
+    def add_many(self, rows):
+        """rows: [(job_id, *texts)]. Сначала df по всей пачке, потом векторы — первые вакансии не получают «пустой» IDF."""
+        parsed = []
+        for job_id, *texts in rows:
+            tf = job_terms(texts)
+            parsed.append((job_id, tf))
+            for feature in tf:
+                self._df[feature] = self._df.get(feature, 0) + 1
+            self._docs += 1
+        if parsed:
+            vectors = self.vectorize_many([tf for _, tf in parsed])
+            self._reserve(self._size + len(parsed))
+            for (job_id, _), vector in zip(parsed, vectors):
+                self._store(job_id, vector)
+
+    def add(self, job_id: int, *texts):
+        self.add_many([(job_id, *texts)])
+
+    def add_job(self, job):
+        self.add(job.id, *(getattr(job, field) for field in INDEXED_FIELDS))
+
+    def _reserve(self, rows: int):
+        capacity = len(self._ids)
+        if rows <= capacity:
+            return
+        extra = max(rows, capacity + capacity // 4) - capacity
+        self._matrix = np.concatenate([self._matrix, np.zeros((extra, self.dim), dtype=np.float32)])
+        self._ids = np.concatenate([self._ids, np.zeros(extra, dtype=np.int64)])
+
+    def _store(self, job_id: int, vector: np.ndarray):
+        row = self._rows.get(job_id)
+        if row is None:
+            self._reserve(self._size + 1)
+            row = self._rows[job_id] = self._size
+            self._size += 1
+            self._ids[row] = job_id
+        self._matrix[row] = vector
+        self.max_id = max(self.max_id, job_id)
+
+    def remove(self, job_ids):
+        removed = 0
+        for job_id in job_ids:
+            row = self._rows.pop(job_id, None)
+            if row is None:
+                continue
+            # на место удалённой строки переносим последнюю — матрица остаётся плотной
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._matrix[last] = 0
+            self._size = last
+            removed += 1
+        return removed
+
+    async def sync(self, db):
+        """Догружает вакансии с id > max_id. При старте — полное построение матрицы."""
+        started = time.perf_counter()
+        stmt = (
+            select(JobPost.id, *(getattr(JobPost, field) for field in INDEXED_FIELDS))
+            .where(JobPost.id > self.max_id)
+            .order_by(JobPost.id)
+        )
+        result = await db.execute(stmt)
+        rows = result.all()
+        self.add_many(rows)
+        if not self.ready:
+            self.ready = True
+            self.built_in = time.perf_counter() - started
+        return len(rows)
+
+    # ---------- поиск ----------
+
+    def top(self, query: np.ndarray, k: int = 30, min_score: float = VECTOR_MIN_SCORE) -> list:
+        """[(job_id, cosine)] — k ближайших вакансий по убыванию близости."""
+        if not self._size or not query.any():
+            return []
+        # одно матрично-векторное произведение на все вакансии (строки и запрос нормированы)
+        scores = self._matrix[:self._size] @ query
+        k = min(k, self._size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(self._ids[i]), float(scores[i])) for i in best if scores[i] >= min_score]
+
+    def top_for_profile(self, profile, k: int = 30) -> list:
+        return self.top(self.vectorize(profile_terms(profile)), k)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "jobs": self._size,
+            "dim": self.dim,
+            "features": len(self._df),
+            "matrix_mb": round(self._matrix.nbytes / 2**20, 1),
+            "max_id": self.max_id,
+            "built_in": self.built_in,
+        }
+
+
+job_vectors = JobVectorIndex()
@@ -0,0 +1,58 @@
+import json
+
+
+class JsonArrayItems:
+    """
+    Разбор JSON-массива объектов по мере поступления текста (стриминговый ответ LLM).
+
+    feed(chunk) возвращает объекты верхнего уровня, которые успели закрыться в этом куске.
+    Текст до первой '[' (пояснения модели, ```json) пропускается; скобки внутри строк
+    и экранированные кавычки не сбивают счётчик вложенности. Битый объект пропускается —
+    остальные элементы массива всё равно будут отданы.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> list:
+        items = []
+        for char in chunk:
+            if self._done:
+                break
+            if not self._started:
+                self._started = char == "["
+                continue
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._buffer = [char]
+                elif char == "]":
+                    self._done = True
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        items.append(json.loads("".join(self._buffer)))
+                    except ValueError:
+                        pass
+                    self._buffer = []
+        return items
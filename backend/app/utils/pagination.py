@@ -0,0 +1,33 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple, Union
+
+# Курсор для keyset-пагинации по (created_at, id) или, для полнотекстового
+# поиска, по (rank, id). Для клиента это непрозрачная строка: base64 от JSON.
+
+def _encode(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def encode_cursor(created_at: datetime, job_id: int) -> str:
+    return _encode({"c": created_at.isoformat(), "id": job_id})
+
+
+def encode_rank_cursor(rank: float, job_id: int) -> str:
+    return _encode({"r": rank, "id": job_id})
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Union[datetime, float], int]]:
+    """Возвращает (created_at или rank, id) либо None. Бросает ValueError на битом курсоре."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if "r" in payload:
+            return float(payload["r"]), int(payload["id"])
+        return datetime.fromisoformat(payload["c"]), int(payload["id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,102 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+# Cost factor bcrypt: каждый +1 удваивает время хеширования. Хеши со старым cost
+# перехешируются при следующем успешном входе (verify_and_update)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt отпускает GIL, поэтому потоков по числу ядер хватает; process — на случай другой реализации
+PASSWORD_EXECUTOR = os.getenv("PASSWORD_EXECUTOR", "thread")  # thread | process
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+# Сколько хеширований может ждать свободного воркера; дальше /login и /register отвечают 503
+PASSWORD_QUEUE_MAX = int(os.getenv("PASSWORD_QUEUE_MAX", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+# Выполняются в пуле: в процессах спавна pwd_context создаётся заново с теми же переменными окружения
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str):
+    return pwd_context.verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    """
+    Хеширование и проверка паролей вне цикла событий: пул из PASSWORD_WORKERS воркеров
+    и не больше PASSWORD_QUEUE_MAX ожидающих операций сверх них. Переполнение — 503 сразу,
+    а не растущая очередь, из-за которой все входы отвечают по таймауту.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_queued: int = PASSWORD_QUEUE_MAX):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor = None
+        self._in_flight = 0
+        self._peak = 0
+        self._counts = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0}
+        self._busy_ms = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if PASSWORD_EXECUTOR == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._in_flight >= self.workers + self.max_queued:
+            self._counts["rejected"] += 1
+            raise HTTPException(status_code=503, detail="Сервер перегружен, попробуйте войти чуть позже")
+        self._in_flight += 1
+        self._peak = max(self._peak, self._in_flight)
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        except BrokenProcessPool:
+            self._executor = None
+            raise HTTPException(status_code=503, detail="Сервис паролей перезапускается, попробуйте ещё раз")
+        finally:
+            self._in_flight -= 1
+            self._busy_ms += (time.perf_counter() - started) * 1000
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(_hash, password)
+        self._counts["hashed"] += 1
+        return hashed
+
+    async def verify_and_update(self, password: str, hashed: str):
+        """(пароль верный, новый хеш или None) — новый хеш, если cost factor хеша устарел."""
+        ok, new_hash = await self._run(_verify_and_update, password, hashed)
+        self._counts["verified"] += 1
+        if new_hash:
+            self._counts["rehashed"] += 1
+        return ok, new_hash
+
+    def stats(self) -> dict:
+        done = self._counts["hashed"] + self._counts["verified"]
+        return {
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "executor": PASSWORD_EXECUTOR,
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.workers),
+            "peak_in_flight": self._peak,
+            **self._counts,
+            "avg_ms": round(self._busy_ms / done, 1) if done else None,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -1,10 +1,152 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
+
 import fitz  # PyMuPDF
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile
+
+# Лимиты на загружаемое резюме
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(10 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+# Разбор PDF — CPU-работа под GIL, поэтому по умолчанию в отдельных процессах
+PDF_EXECUTOR = os.getenv("PDF_EXECUTOR", "process")  # process | thread
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "60"))
+
+READ_CHUNK = 64 * 1024
+
+_pool = None
+
+
+class PdfLimitExceeded(ValueError):
+    pass
+
+
+class PdfExtraction(NamedTuple):
+    text: str
+    page_ms: list  # время извлечения каждой страницы, мс
+
+    def stats(self) -> dict:
+        return {"pages": len(self.page_ms), "total_ms": round(sum(self.page_ms), 1), "page_ms": self.page_ms}
+
+
+def _report_pid(pids):
+    # инициализатор воркера: pid нужен, чтобы убить процессы пула, не трогая приватный executor._processes
+    pids.put(os.getpid())
+
+
+class PdfPool:
+    """
+    Пул разбора PDF. wait_for по таймауту бросает только future, а воркер продолжает разбирать файл,
+    поэтому процессный пул после таймаута уходит в отставку: новые разборы идут в свежий пул,
+    а процессы старого убиваются, как только доработают его остальные разборы. Убить один процесс
+    нельзя — ProcessPoolExecutor тогда ломается целиком и параллельные разборы получили бы 503.
+    Поток не прервать: thread-пул остаётся, зависший разбор доработает в фоне.
+    """
+
+    def __init__(self):
+        self.running = 0
+        self.retired = False
+        self._pids = None
+        if PDF_EXECUTOR == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="pdf")
+        else:
+            # spawn, а не fork: не копируем в дочерний процесс цикл событий и пул соединений
+            context = multiprocessing.get_context("spawn")
+            self._pids = context.SimpleQueue()
+            self.executor = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS, mp_context=context, initializer=_report_pid, initargs=(self._pids,),
+            )
+
+    async def run(self, fn, *args):
+        self.running += 1
+        try:
+            return await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(self.executor, fn, *args), PDF_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            if self._pids is not None:
+                self.retired = True
+            raise
+        except BrokenProcessPool:
+            # процесс пула упал (например, OOM на огромном файле) — следующий вызов создаст пул заново
+            self.retired = True
+            raise
+        finally:
+            self.running -= 1
+            if self.retired and not self.running:
+                self._kill()
+
+    def _kill(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        while not self._pids.empty():
+            try:
+                os.kill(self._pids.get(), signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+def get_pool() -> PdfPool:
+    # пул в отставке заменяет тот, кто первым за ним пришёл; сам пул ссылку на себя не сбрасывает
+    global _pool
+    if _pool is None or _pool.retired:
+        _pool = PdfPool()
+    return _pool
+
+
+async def read_upload(file: UploadFile, max_bytes: int = PDF_MAX_BYTES) -> bytes:
+    """Читает загрузку кусками и обрывает чтение, как только превышен лимит."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(READ_CHUNK)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Файл больше {max_bytes / (1024 * 1024):.1f} МБ")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def extract_pages(content: bytes, max_pages: int = PDF_MAX_PAGES) -> PdfExtraction:
+    """Синхронный разбор — выполняется в пуле. Страницы собираются списком и склеиваются один раз."""
+    texts = []
+    page_ms = []
+    with fitz.open(stream=content, filetype="pdf") as doc:
+        if doc.page_count > max_pages:
+            raise PdfLimitExceeded(f"В PDF {doc.page_count} страниц, допустимо не больше {max_pages}")
+        for page in doc:
+            started = time.perf_counter()
+            texts.append(page.get_text())
+            page_ms.append(round((time.perf_counter() - started) * 1000, 1))
+    return PdfExtraction("".join(texts), page_ms)
+
+
+async def extract_pdf(content: bytes) -> PdfExtraction:
+    try:
+        extraction = await get_pool().run(extract_pages, content, PDF_MAX_PAGES)
+    except PdfLimitExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=422, detail="PDF обрабатывается слишком долго")
+    except BrokenProcessPool:
+        raise HTTPException(status_code=503, detail="Обработчик PDF перезапускается, попробуйте ещё раз")
+    except RuntimeError as e:  # битый/зашифрованный файл (FileDataError в новых PyMuPDF — тоже RuntimeError)
+        raise HTTPException(status_code=400, detail=f"Не удалось прочитать PDF: {e}")
+
+    stats = extraction.stats()
+    slowest = max(range(len(extraction.page_ms)), key=extraction.page_ms.__getitem__, default=None)
+    print(f"📄 PDF: {stats['pages']} стр. за {stats['total_ms']} мс"
+          + (f", самая медленная — стр. {slowest + 1} ({extraction.page_ms[slowest]} мс)" if slowest is not None else ""))
+    return extraction
+
 
 async def extract_text_from_pdf(file: UploadFile) -> str:
-    content = await file.read()
-    doc = fitz.open(stream=content, filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text 
\ No newline at end of file
+    content = await read_upload(file)
+    return (await extract_pdf(content)).text
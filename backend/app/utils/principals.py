@@ -0,0 +1,124 @@
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.models import User
+
+# Сколько секунд держим пользователя, загруженного из БД
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+AUTH_CACHE_MAX_USERS = int(os.getenv("AUTH_CACHE_MAX_USERS", "10000"))
+# Токены с iat принимаются по подписи, без похода в БД. Оговорка: о правке и удалении пользователя
+# знает только процесс, который её сделал, и только до рестарта. Токен пользователя, удалённого
+# другим процессом или сырым SQL, действует до своего exp (ACCESS_TOKEN_EXPIRE_MINUTES).
+# AUTH_TRUST_TOKEN_CLAIMS=0 — каждый запрос проверяет пользователя в БД (через кэш с AUTH_CACHE_TTL)
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "1") == "1"
+# Сколько помним, что пользователь менялся: должно быть не меньше срока жизни токена
+AUTH_CHANGES_TTL = float(os.getenv("AUTH_CHANGES_TTL", "86400"))
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """
+    Аутентифицированный пользователь без привязки к сессии БД. Эндпоинтам нужен только id,
+    поэтому в токене нет ничего, кроме sub и iat: персональные данные в JWT не попадают.
+    """
+    id: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserPrincipal":
+        return cls(user.id)
+
+
+class PrincipalCache:
+    """
+    LRU-кэш с TTL для разрешения токена в пользователя, в памяти процесса:
+    - проверенные токены: токен -> payload (подпись проверяется один раз, срок — при каждом запросе);
+    - пользователи из БД: user_id -> UserPrincipal.
+    Изменение или удаление User через ORM сбрасывает запись пользователя и запоминает время правки:
+    токены, выпущенные до неё, больше не принимаются без БД (см. оговорку у AUTH_TRUST_TOKEN_CLAIMS).
+    """
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_users: int = AUTH_CACHE_MAX_USERS):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.hits = 0
+        self.misses = 0
+        self.claims_hits = 0
+        self._users = OrderedDict()   # user_id -> (principal, monotonic-время загрузки)
+        self._tokens = OrderedDict()  # token -> payload
+        self._changed = {}            # user_id -> unix-время последней правки
+
+    # ---------- токены ----------
+
+    def get_payload(self, token: str) -> Optional[dict]:
+        payload = self._tokens.get(token)
+        if payload is None:
+            return None
+        if payload.get("exp", 0) <= time.time():
+            del self._tokens[token]
+            return None
+        self._tokens.move_to_end(token)
+        return payload
+
+    def set_payload(self, token: str, payload: dict):
+        self._tokens[token] = payload
+        while len(self._tokens) > self.max_users:
+            self._tokens.popitem(last=False)
+
+    def from_token_claims(self, payload: dict) -> Optional[UserPrincipal]:
+        """Пользователь прямо из sub, если токену можно верить без БД."""
+        if not AUTH_TRUST_TOKEN_CLAIMS or "iat" not in payload:
+            return None
+        principal = UserPrincipal(int(payload["sub"]))
+        changed_at = self._changed.get(principal.id)
+        if changed_at is not None and payload["iat"] <= changed_at:
+            return None  # токен выпущен до правки или удаления пользователя — проверяем в БД
+        self.claims_hits += 1
+        return principal
+
+    # ---------- пользователи ----------
+
+    def get(self, user_id: int) -> Optional[UserPrincipal]:
+        entry = self._users.get(user_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            self.misses += 1
+            return None
+        self._users.move_to_end(user_id)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, principal: UserPrincipal):
+        self._users[principal.id] = (principal, time.monotonic())
+        self._users.move_to_end(principal.id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        self._users.pop(user_id, None)
+        now = time.time()
+        self._changed[user_id] = now
+        if len(self._changed) > self.max_users:
+            self._changed = {uid: t for uid, t in self._changed.items() if now - t < AUTH_CHANGES_TTL}
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "claims_hits": self.claims_hits,
+            "users": len(self._users),
+            "tokens": len(self._tokens),
+        }
+
+
+principal_cache = PrincipalCache()
+
+
+# Любая правка или удаление пользователя через ORM в этом процессе сбрасывает кэш
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    principal_cache.invalidate(target.id)
@@ -0,0 +1,66 @@
+import json
+
+# Сколько кандидатов после дешёвого отбора уходит в LLM и сколько символов описания им оставляем
+RECOMMEND_CANDIDATES = 40
+LLM_DESCRIPTION_CHARS = 600
+# Сколько вакансий модель возвращает и сколько токенов ответа закладываем на одну (id, score, 1–2 коротких причины)
+RECOMMEND_LLM_TOP = 15
+RECOMMEND_TOKENS_PER_ITEM = 120
+
+# Поля, которые реально нужны модели для оценки совместимости
+LLM_JOB_FIELDS = ["id", "title", "industry", "location", "format", "salary", "deadline", "description"]
+LLM_PROFILE_FIELDS = [
+    "desired_position", "experience_level", "skills", "experience", "education", "achievements",
+    "languages", "interests", "desired_city", "desired_format", "desired_work_time", "desired_salary", "industries",
+]
+
+
+def parse_profile_list(field_value) -> list[str]:
+    """Поле профиля как JSON-массив или строка через запятую -> список в нижнем регистре."""
+    if not field_value:
+        return []
+    try:
+        parsed = json.loads(field_value)
+        if isinstance(parsed, list):
+            return [str(item).strip().lower() for item in parsed if item]
+        else:
+            return [str(parsed).strip().lower()]
+    except:
+        return [s.strip().lower() for s in str(field_value).split(",") if s.strip()]
+
+
+def profile_search_terms(profile) -> list[str]:
+    """Ключевые термины профиля для полнотекстового отбора кандидатов."""
+    terms = []
+    if profile.desired_position:
+        terms.append(profile.desired_position.strip().lower())
+    terms += parse_profile_list(profile.skills)
+    terms += parse_profile_list(profile.industries)
+    # уникальные, с сохранением порядка
+    return list(dict.fromkeys(t for t in terms if t))
+
+
+def profile_search_query(profile) -> str:
+    """Строка для websearch_to_tsquery: термины через OR, многословные — фразой в кавычках."""
+    parts = []
+    for term in profile_search_terms(profile):
+        term = term.replace('"', " ").strip()
+        if term:
+            parts.append(f'"{term}"' if " " in term else term)
+    return " OR ".join(parts)
+
+
+def _jsonable(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def trim_job_for_llm(job) -> dict:
+    data = {field: _jsonable(getattr(job, field)) for field in LLM_JOB_FIELDS}
+    if data["description"] and len(data["description"]) > LLM_DESCRIPTION_CHARS:
+        data["description"] = data["description"][:LLM_DESCRIPTION_CHARS] + "…"
+    return {k: v for k, v in data.items() if v not in (None, "")}
+
+
+def trim_profile_for_llm(profile) -> dict:
+    data = {field: _jsonable(getattr(profile, field)) for field in LLM_PROFILE_FIELDS}
+    return {k: v for k, v in data.items() if v not in (None, "")}
@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+RECOMMEND_CACHE_TTL = float(os.getenv("RECOMMEND_CACHE_TTL", "1800"))         # сек
+RECOMMEND_CACHE_MAX_USERS = int(os.getenv("RECOMMEND_CACHE_MAX_USERS", "1000"))
+
+
+def profile_version(profile) -> str:
+    """Отпечаток всех полей профиля: любая правка профиля даёт новую версию."""
+    data = {field: getattr(profile, field) for field in profile.__table__.columns.keys()}
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class RecommendationCache:
+    """
+    LRU-кэш готовых рекомендаций по user_id с TTL. Запись валидна, только пока
+    совпадают версия профиля и версия набора вакансий, с которыми она считалась.
+    Живёт в памяти процесса (воркера uvicorn).
+    """
+
+    def __init__(self, ttl: float = RECOMMEND_CACHE_TTL, max_users: int = RECOMMEND_CACHE_MAX_USERS):
+        self.ttl = ttl
+        self.max_users = max_users
+        # растёт при вставке/удалении вакансий в этом процессе
+        self.jobs_version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, user_id: int, profile_ver: str, jobs_ver):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] != (profile_ver, jobs_ver) or time.monotonic() - entry[1] > self.ttl:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, user_id: int, profile_ver: str, jobs_ver, value):
+        self._entries[user_id] = ((profile_ver, jobs_ver), time.monotonic(), value)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+    def bump_jobs_version(self):
+        self.jobs_version += 1
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+recommendation_cache = RecommendationCache()
@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+# Сколько резюме обрабатываем одновременно (каждое — парсинг PDF + вызов LLM)
+RESUME_WORKERS = int(os.getenv("RESUME_WORKERS", "2"))
+# Сколько задач может ждать в очереди; дальше POST /upload_resume отвечает 503
+RESUME_QUEUE_MAX = int(os.getenv("RESUME_QUEUE_MAX", "100"))
+# Сколько секунд храним завершённые задачи (для опроса статуса и идемпотентности)
+RESUME_TASK_TTL = int(os.getenv("RESUME_TASK_TTL", "3600"))
+
+QUEUED, PROCESSING, DONE, FAILED = "queued", "processing", "done", "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+def file_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+@dataclass
+class ResumeTask:
+    id: str
+    user_id: int
+    file_hash: str
+    content: Optional[bytes]
+    status: str = QUEUED
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def public(self) -> dict:
+        return {"task_id": self.id, "status": self.status, "result": self.result, "error": self.error}
+
+
+class ResumeTaskQueue:
+    """
+    Фоновая обработка резюме: ограниченная очередь + RESUME_WORKERS воркеров в цикле событий.
+
+    Задачи и их результаты живут в памяти процесса. Повторная загрузка того же файла
+    (sha256 содержимого) тем же пользователем, пока прежняя задача в очереди или в работе,
+    возвращает прежнюю задачу. Загрузка после завершения — новая задача: профиль могли
+    поменять, и результат надо применить заново (анализ при этом берётся из кэша, без LLM).
+    """
+
+    def __init__(self, workers: int = RESUME_WORKERS, max_queued: int = RESUME_QUEUE_MAX):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue = None
+        self._tasks = {}      # task_id -> ResumeTask
+        self._by_file = {}    # (user_id, file_hash) -> task_id
+        self._workers = []
+        self._handler = None
+
+    def start(self, handler):
+        """handler(user_id, content) -> результат задачи (корутина)."""
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, user_id: int, content: bytes) -> ResumeTask:
+        self._purge()
+        key = (user_id, file_hash(content))
+        existing = self._tasks.get(self._by_file.get(key))
+        if existing is not None and existing.status in (QUEUED, PROCESSING):
+            return existing
+
+        task = ResumeTask(id=uuid.uuid4().hex, user_id=user_id, file_hash=key[1], content=content)
+        try:
+            self._queue.put_nowait(task)
+        except asyncio.QueueFull:
+            raise QueueFull()
+        self._tasks[task.id] = task
+        self._by_file[key] = task.id
+        return task
+
+    def get(self, task_id: str) -> Optional[ResumeTask]:
+        return self._tasks.get(task_id)
+
+    async def _worker(self):
+        while True:
+            task = await self._queue.get()
+            task.status = PROCESSING
+            try:
+                task.result = await self._handler(task.user_id, task.content)
+                task.status = DONE
+            except Exception as e:
+                task.status = FAILED
+                task.error = getattr(e, "detail", None) or str(e)
+                print(f"❌ Ошибка обработки резюме (задача {task.id}):", e)
+            finally:
+                task.content = None  # PDF больше не нужен — не держим его в памяти
+                task.finished_at = time.time()
+                self._queue.task_done()
+
+    def _purge(self):
+        cutoff = time.time() - RESUME_TASK_TTL
+        for task_id in [t.id for t in self._tasks.values() if t.finished_at and t.finished_at < cutoff]:
+            task = self._tasks.pop(task_id)
+            if self._by_file.get((task.user_id, task.file_hash)) == task_id:
+                del self._by_file[(task.user_id, task.file_hash)]
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "workers": self.workers,
+            "tasks": len(self._tasks),
+        }
+
+
+resume_tasks = ResumeTaskQueue()
@@ -1,10 +1,12 @@
 import os
-from telethon import TelegramClient
 from dotenv import load_dotenv
 
+from common.telegram_gateway import TelegramGateway, TELEGRAM_SESSION
+
 load_dotenv()
 
 api_id = int(os.getenv("TG_API_ID"))
 api_hash = os.getenv("TG_API_HASH")
 
-telegram_client = TelegramClient("tg_session", api_id, api_hash) 
\ No newline at end of file
+# Единственный клиент Telegram на сессию: им пользуются и API, и ингестер (через /internal-эндпоинты)
+telegram_gateway = TelegramGateway(TELEGRAM_SESSION, api_id, api_hash)
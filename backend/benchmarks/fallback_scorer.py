@@ -0,0 +1,208 @@
+"""
+Бенчмарк fallback-скоринга рекомендаций: старая функция из app/main.py против ProfileMatcher.
+
+Генерирует синтетические вакансии и профили, сверяет (score, matches) для каждой пары —
+результаты должны совпадать один в один — сверяет топ-30, как его отдаёт /recommendations, и печатает медиану времени на полный проход.
+БД не нужна: вакансии — простые объекты с теми же полями, что и JobPost.
+
+Запуск (из backend/):
+    PYTHONPATH=. python benchmarks/fallback_scorer.py [--jobs 50000] [--repeat 5]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.utils import matcher as matcher_module
+from app.utils.matcher import ProfileMatcher
+from app.utils.recommend import parse_profile_list
+
+TITLES = ["Python Developer", "Senior Python Developer", "Frontend Developer", "Junior Frontend разработчик",
+          "Data Analyst", "Менеджер по продажам", "Backend Engineer", "Lead Data Scientist", "Стажер-аналитик",
+          "Middle Java Developer", "DevOps инженер", "Бухгалтер"]
+WORDS = ["python", "django", "react", "sql", "docker", "kubernetes", "aws", "api", "rest", "microservices",
+         "опыт", "работы", "от", "года", "команда", "продукт", "финтех", "банк", "excel", "1с", "удаленно",
+         "полный", "день", "гибкий", "график", "junior", "middle", "senior", "lead", "опытный", "стажер",
+         "machine", "learning", "data", "science", "frontend", "backend", "fullstack", "mongodb", "javascript"]
+LOCATIONS = ["Алматы", "Астана", "Шымкент", "Remote", None, ""]
+TOP = 30
+FORMATS = ["remote", "office", "hybrid", "Удаленно", None]
+
+PROFILES = [
+    dict(skills='["python", "django", "sql", "docker"]', industries="финтех, банк", desired_position="Python Developer",
+         desired_city="Алматы", desired_format="remote", desired_work_time="полный день", experience_level="middle",
+         experience="3 года python, docker, rest api", education="КБТУ, data science", achievements="microservices"),
+    dict(skills="react, javascript", industries="", desired_position="frontend разработчик", desired_city="астана",
+         desired_format="", desired_work_time="", experience_level="junior", experience=None, education=None,
+         achievements=None),
+    dict(skills="", industries="", desired_position="", desired_city="", desired_format="", desired_work_time="",
+         experience_level="", experience="", education="", achievements=""),
+    dict(skills='["excel", "1с", ""]', industries="банк", desired_position="Бухгалтер", desired_city="",
+         desired_format="office", desired_work_time="гибкий график", experience_level="lead",
+         experience="", education="", achievements=""),
+]
+
+
+def legacy_scorer(profile):
+    """Копия прежней вложенной comprehensive_relevance_score из app/main.py — эталон для сверки."""
+    user_skills = parse_profile_list(profile.skills)
+    user_industries = parse_profile_list(profile.industries)
+    user_position = (profile.desired_position or "").lower()
+    user_city = (profile.desired_city or "").lower()
+    user_format = (profile.desired_format or "").lower()
+    user_work_time = (profile.desired_work_time or "").lower()
+    user_experience_level = (profile.experience_level or "").lower()
+
+    experience_text = (profile.experience or "").lower()
+    education_text = (profile.education or "").lower()
+    achievements_text = (profile.achievements or "").lower()
+
+    additional_keywords = []
+    tech_keywords = ['python', 'javascript', 'java', 'react', 'django', 'sql', 'mongodb', 'aws', 'docker', 'kubernetes', 'machine learning', 'data science', 'frontend', 'backend', 'fullstack', 'api', 'rest', 'microservices']
+    for keyword in tech_keywords:
+        if keyword in experience_text or keyword in education_text or keyword in achievements_text:
+            additional_keywords.append(keyword)
+
+    def comprehensive_relevance_score(job):
+        score = 0
+        matches = []
+        job_title = (job.title or "").lower()
+        job_description = (job.description or "").lower()
+        job_location = (job.location or "").lower()
+        job_format = (job.format or "").lower()
+        job_text = f"{job_title} {job_description}"
+
+        if user_position and user_position in job_title:
+            score += 15
+            matches.append(f"Точное совпадение должности: {user_position}")
+        elif user_position and any(word in job_title for word in user_position.split() if len(word) > 2):
+            score += 8
+            matches.append(f"Частичное совпадение должности: {user_position}")
+
+        skill_matches = [skill for skill in user_skills if skill in job_text]
+        score += len(skill_matches) * 4
+        if skill_matches:
+            matches.append(f"Навыки из профиля: {', '.join(skill_matches[:4])}")
+
+        experience_matches = [kw for kw in additional_keywords if kw in job_text]
+        score += len(experience_matches) * 3
+        if experience_matches:
+            matches.append(f"Навыки из опыта: {', '.join(experience_matches[:3])}")
+
+        level_keywords = {
+            'junior': ['junior', 'intern', 'entry', 'начинающий', 'стажер'],
+            'middle': ['middle', 'mid', 'experienced', 'опытный'],
+            'senior': ['senior', 'lead', 'старший', 'ведущий', 'главный']
+        }
+        if user_experience_level:
+            for level, keywords in level_keywords.items():
+                if user_experience_level in keywords:
+                    if any(kw in job_text for kw in level_keywords[level]):
+                        score += 6
+                        matches.append(f"Уровень опыта: {user_experience_level}")
+                    break
+
+        industry_matches = [ind for ind in user_industries if ind in job_text]
+        score += len(industry_matches) * 5
+        if industry_matches:
+            matches.append(f"Индустрия: {', '.join(industry_matches[:2])}")
+
+        if user_city and user_city in job_location:
+            score += 4
+            matches.append(f"Город: {user_city}")
+
+        if user_format and user_format in job_format:
+            score += 3
+            matches.append(f"Формат работы: {user_format}")
+
+        if user_work_time and user_work_time in job_text:
+            score += 2
+            matches.append(f"График работы: {user_work_time}")
+
+        if len(matches) >= 3:
+            score += 2
+            matches.append("Бонус за множественные совпадения")
+
+        return (score, matches)
+
+    return comprehensive_relevance_score
+
+
+def make_jobs(n: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    parsed_at = datetime(2025, 1, 1)
+    jobs = []
+    for i in range(n):
+        jobs.append(SimpleNamespace(
+            id=i + 1,
+            parsed_at=parsed_at,
+            title=rng.choice(TITLES),
+            description=" ".join(rng.choices(WORDS, k=rng.randint(20, 120))),
+            location=rng.choice(LOCATIONS),
+            format=rng.choice(FORMATS),
+        ))
+    return jobs
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    jobs = make_jobs(args.jobs)
+    print(f"📦 {len(jobs)} вакансий, {len(PROFILES)} профилей, повторов {args.repeat}\n")
+
+    for i, fields in enumerate(PROFILES, 1):
+        profile = SimpleNamespace(**fields)
+        legacy = legacy_scorer(profile)
+
+        # сверка: ответы обязаны совпадать полностью, включая порядок и текст причин
+        expected = [legacy(job) for job in jobs]
+        matcher = ProfileMatcher(profile)
+        mismatches = sum(1 for job, want in zip(jobs, expected) if matcher.score(job) != want or matcher.rank(job) != want[0])
+        assert mismatches == 0, f"профиль {i}: {mismatches} расхождений"
+
+        def legacy_top():
+            # как прежний fallback в app/main.py: скор всех вакансий, сортировка, топ-30
+            scored = []
+            for job in jobs:
+                score, matches = legacy(job)
+                if score > 0:
+                    scored.append((job, score, matches))
+            return sorted(scored, key=lambda x: x[1], reverse=True)[:TOP]
+
+        def matcher_top():
+            return ProfileMatcher(profile).top(jobs, TOP)
+
+        def matcher_top_cold():
+            matcher_module._normalized_cache.clear()
+            return matcher_top()
+
+        assert [(job.id, score, matches) for job, score, matches in matcher_top()] == \
+            [(job.id, score, matches) for job, score, matches in legacy_top()], f"профиль {i}: другой топ"
+
+        legacy_time = timed(legacy_top, args.repeat)
+        cold_time = timed(matcher_top_cold, args.repeat)
+        warm_time = timed(matcher_top, args.repeat)
+        print(f"профиль {i}: старый {legacy_time * 1000:8.1f} ms | "
+              f"matcher (холодный кэш) {cold_time * 1000:8.1f} ms | "
+              f"matcher (тёплый кэш) {warm_time * 1000:8.1f} ms | "
+              f"x{legacy_time / warm_time:.1f}")
+
+    print("\n✅ Результаты совпадают для всех профилей")
+
+
+if __name__ == "__main__":
+    main()
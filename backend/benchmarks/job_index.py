@@ -0,0 +1,98 @@
+"""
+Бенчмарк инвертированного индекса app/utils/job_index.py.
+
+Строит индекс по синтетическим вакансиям (те же генераторы, что в fallback_scorer.py),
+проверяет, что candidates() — надмножество вакансий, где паттерн встречается как подстрока
+(как ILIKE / `in`), и сравнивает время поиска с полным перебором текста.
+Проверяет и инкрементальные обновления: удаление старых вакансий и переиндексацию.
+
+Запуск (из backend/):
+    PYTHONPATH=. python benchmarks/job_index.py [--jobs 50000] [--repeat 5]
+"""
+import argparse
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from app.utils.job_index import JobTextIndex, INDEXED_FIELDS
+from app.utils.matcher import ProfileMatcher
+from benchmarks.fallback_scorer import make_jobs, PROFILES
+
+INDUSTRIES = ["IT", "Финтех", "Ритейл", None]
+QUERIES = ["term1234", "term57", "python", "Python Developer", "финтех", "полный день", "machine learning", "1с", "mid", "react", "бухгалтер", "kotlin"]
+
+
+def job_text(job) -> str:
+    return " ".join((getattr(job, field) or "").lower() for field in INDEXED_FIELDS)
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def check_superset(index, jobs, patterns):
+    ids = index.candidates(patterns)
+    if ids is None:
+        return None
+    exact = {job.id for job in jobs if any(p.lower() in job_text(job) for p in patterns)}
+    assert exact <= ids, f"{patterns}: индекс потерял {len(exact - ids)} вакансий"
+    return ids, exact
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    jobs = make_jobs(args.jobs)
+    rng = random.Random(7)
+    for job in jobs:
+        job.industry = INDUSTRIES[job.id % len(INDUSTRIES)]
+        # длинный хвост редких слов, как в реальных описаниях (названия компаний, стеков, улиц)
+        job.description += " " + " ".join(f"term{int(rng.paretovariate(1.2))}" for _ in range(10))
+    index = JobTextIndex()
+    started = time.perf_counter()
+    for job in jobs:
+        index.add_job(job)
+    index.ready = True
+    print(f"🗂️ построение: {(time.perf_counter() - started) * 1000:.0f} ms, {index.stats()}\n")
+
+    for q in QUERIES:
+        checked = check_superset(index, jobs, [q])
+        scan = timed(lambda: [job.id for job in jobs if q.lower() in job_text(job)], args.repeat)
+        lookup = timed(lambda: index.candidates([q]), args.repeat)
+        narrowed = "без сужения" if checked is None else f"кандидатов {len(checked[0])}, точных {len(checked[1])}"
+        print(f"{q!r:20} перебор {scan * 1000:8.1f} ms | индекс {lookup * 1000:8.3f} ms | {narrowed}")
+
+    print()
+    for i, fields in enumerate(PROFILES, 1):
+        matcher = ProfileMatcher(SimpleNamespace(**fields))
+        patterns = matcher.search_patterns()
+        checked = check_superset(index, jobs, patterns)
+        lookup = timed(lambda: index.candidates(patterns), args.repeat)
+        narrowed = "без сужения" if checked is None else f"кандидатов {len(checked[0])}"
+        print(f"профиль {i}: индекс {lookup * 1000:8.3f} ms | {narrowed}")
+
+    # инкрементальные обновления: удаляем треть (как clean_old_jobs), меняем текст части вакансий
+    removed = [job.id for job in jobs[: len(jobs) // 3]]
+    index.remove(removed)
+    jobs = jobs[len(jobs) // 3:]
+    for job in jobs[:1000]:
+        job.description = "kotlin android " + job.description
+        index.add_job(job)
+    for q in QUERIES:
+        checked = check_superset(index, jobs, [q])
+        if checked is not None:
+            assert not checked[0] & set(removed), f"{q!r}: удалённые вакансии остались в индексе"
+    print("\n✅ Индекс — надмножество точных совпадений, в том числе после удаления и переиндексации")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Адаптивный token-bucket лимитер для вызовов Azure OpenAI.
+
+Один экземпляр на процесс, общий для всех путей этого процесса, которые ходят в LLM.
+Лежит в общем пакете common, который импортируют и бэкенд (анализ резюме, рекомендации),
+и ингестер вакансий (`from common.llm_rate_limiter import ...`).
+
+Состояние ведер живёт в памяти процесса, а квота деплоймента у всех процессов одна.
+Поэтому каждый процесс берёт себе только долю LLM_QUOTA_SHARE от LLM_RPM/LLM_TPM:
+по умолчанию половину — бэкенду и ингестеру поровну. Если процессов больше
+(uvicorn --workers N) или квоту нужно поделить иначе, задайте LLM_QUOTA_SHARE
+каждому процессу так, чтобы доли в сумме не превышали 1.
+
+На 429 лимитер выдерживает паузу из Retry-After, временно снижает темп и
+повторяет вызов; после успешных вызовов темп постепенно восстанавливается.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LLM_RPM = float(os.getenv("LLM_RPM", "60"))              # запросов в минуту по квоте деплоймента (на все процессы)
+LLM_TPM = float(os.getenv("LLM_TPM", "60000"))           # токенов в минуту по квоте деплоймента (на все процессы)
+LLM_QUOTA_SHARE = float(os.getenv("LLM_QUOTA_SHARE", "0.5"))  # доля квоты, которую тратит этот процесс
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))  # повторы одного вызова после 429
+
+MIN_RATE_FACTOR = 0.1
+RECOVERY_STEP = 0.05
+DEFAULT_RETRY_AFTER = 10.0
+
+
+def estimate_tokens(text: str) -> int:
+    # грубо: ~3 символа на токен для смеси кириллицы и латиницы
+    return len(text) // 3 + 1
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after_seconds(error: Exception) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return DEFAULT_RETRY_AFTER
+
+
+class LLMRateLimiter:
+    """
+    Два ведра — запросы и токены — наполняются равномерно со скоростью квоты.
+    reserve() списывает стоимость сразу (ведро может уйти в минус) и возвращает,
+    сколько ждать: так вызовы выстраиваются в очередь, а не гоняются за остатком.
+    Потокобезопасен: синхронные клиенты OpenAI вызываются из потоков.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM * LLM_QUOTA_SHARE, tpm: float = LLM_TPM * LLM_QUOTA_SHARE,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_retries = max_retries
+        self.rate_factor = 1.0
+        self._requests = rpm
+        self._tokens = tpm
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "throttled_seconds": 0.0, "rate_limited": 0}
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm * self.rate_factor / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm * self.rate_factor / 60)
+
+    def reserve(self, tokens: int) -> float:
+        """Списывает 1 запрос и tokens токенов, возвращает паузу в секундах до вызова."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._requests -= 1
+            self._tokens -= min(tokens, self.tpm)
+            wait = max(
+                self._blocked_until - now,
+                -self._requests * 60 / (self.rpm * self.rate_factor),
+                -self._tokens * 60 / (self.tpm * self.rate_factor),
+                0.0,
+            )
+            self.stats["calls"] += 1
+            self.stats["throttled_seconds"] += wait
+            return wait
+
+    def record_usage(self, estimated: int, actual: int):
+        """Поправка на фактический расход токенов из response.usage."""
+        with self._lock:
+            self._tokens -= actual - estimated
+
+    def on_success(self):
+        with self._lock:
+            self.rate_factor = min(1.0, self.rate_factor + RECOVERY_STEP)
+
+    def on_rate_limited(self, retry_after: float):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor / 2)
+            self.stats["rate_limited"] += 1
+        logger.warning(f"⏳ LLM 429: пауза {retry_after:.1f} с, темп снижен до {self.rate_factor:.0%} квоты")
+
+    def _after_call(self, response, estimated: int):
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.record_usage(estimated, usage.total_tokens)
+        self.on_success()
+
+    def call(self, fn, *, estimated_tokens: int, **kwargs):
+        """Синхронный вызов fn(**kwargs) под лимитером, с повтором на 429."""
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.reserve(estimated_tokens))
+            try:
+                response = fn(**kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.on_rate_limited(retry_after_seconds(e))
+                continue
+            self._after_call(response, estimated_tokens)
+            return response
+
+    async def acall(self, fn, *, estimated_tokens: int, **kwargs):
+        """То же для корутин (AsyncAzureOpenAI): ждём через asyncio.sleep, не блокируя цикл."""
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.reserve(estimated_tokens))
+            try:
+                response = await fn(**kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.on_rate_limited(retry_after_seconds(e))
+                continue
+            self._after_call(response, estimated_tokens)
+            return response
+
+
+# Общий экземпляр процесса: LLM_QUOTA_SHARE квоты деплоймента
+llm_rate_limiter = LLMRateLimiter()
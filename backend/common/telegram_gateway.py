@@ -0,0 +1,140 @@
+"""
+Единственный долгоживущий клиент Telegram на файл сессии.
+
+Держит одно тёплое соединение и сериализует обращения к сессии: файл tg_session.session —
+это SQLite, и два процесса с собственными TelegramClient на нём упираются в блокировки.
+Поэтому сессией владеет бэкенд (экземпляр в app.utils.telegram_client), а ингестер ходит
+к нему по HTTP (BackendClient.fetch_messages / resolve_channel — тот же интерфейс).
+Ингестер может и сам поднять шлюз (TELEGRAM_GATEWAY=local), если бэкенд не запущен.
+Лежит в общем пакете common рядом с лимитером LLM.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from telethon import TelegramClient
+from telethon.tl.types import Channel, Message
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_SESSION = os.getenv("TELEGRAM_SESSION", "tg_session")
+# Сколько запросов к Telegram идёт одновременно; 1 — строго по очереди
+TELEGRAM_CONCURRENCY = int(os.getenv("TELEGRAM_CONCURRENCY", "1"))
+# Потолок сообщений за один fetch_messages (Telethon сам дробит на страницы по 100)
+TELEGRAM_MAX_FETCH = int(os.getenv("TELEGRAM_MAX_FETCH", "500"))
+
+
+class TelegramMessage(NamedTuple):
+    """То, что ингестеру нужно от сообщения; одинаково для локального шлюза и для HTTP."""
+    id: int
+    date: datetime
+    message: Optional[str]  # None у служебных сообщений и сообщений без текста
+
+    @classmethod
+    def from_telethon(cls, message) -> "TelegramMessage":
+        text = message.message if isinstance(message, Message) else None
+        return cls(message.id, message.date, text or None)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TelegramMessage":
+        return cls(data["id"], datetime.fromisoformat(data["date"]), data.get("message"))
+
+    def public(self) -> dict:
+        return {"id": self.id, "date": self.date.isoformat(), "message": self.message}
+
+
+def entity_info(entity) -> dict:
+    """
+    Что кэшируем о найденной сущности. access_hash — только у каналов: с ним запросы идут без resolve.
+    Пользователи и боты тоже резолвятся по username, но каналом не считаются (status="not_channel").
+    """
+    is_channel = isinstance(entity, Channel)
+    return {
+        "username": (getattr(entity, "username", None) or "").lower() or None,
+        "status": "public" if is_channel else "not_channel",
+        "channel_id": entity.id if is_channel else None,
+        "access_hash": entity.access_hash if is_channel else None,
+        "title": getattr(entity, "title", None),
+    }
+
+
+class TelegramGateway:
+    """
+    Подключается при первом обращении и дальше держит соединение (переподключение после
+    обрыва делает сам Telethon, а если клиент всё же отключился — следующий вызов подключит заново).
+    Все запросы идут через семафор на TELEGRAM_CONCURRENCY мест.
+    """
+
+    def __init__(self, session: str, api_id: int, api_hash: str, concurrency: int = TELEGRAM_CONCURRENCY):
+        self.session = session
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.concurrency = concurrency
+        self._client = None
+        self._connect_lock = None
+        self._slots = None
+        self.requests = 0
+        self.errors = 0
+        self.connected_at = None
+
+    async def start(self, interactive: bool = False):
+        """Подключение. interactive=True разрешает вход по коду (только из консоли ингестера)."""
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._connect_lock:
+            if self._client is not None and self._client.is_connected():
+                return
+            if self._client is None:
+                self._client = TelegramClient(self.session, self.api_id, self.api_hash)
+            if interactive:
+                await self._client.start()
+            else:
+                await self._client.connect()
+                if not await self._client.is_user_authorized():
+                    await self._client.disconnect()
+                    raise RuntimeError("Сессия Telegram не авторизована: войдите через ингестер (TELEGRAM_GATEWAY=local)")
+            self.connected_at = time.time()
+            logger.info("🔌 Telegram gateway connected")
+
+    async def close(self):
+        if self._client is not None and self._client.is_connected():
+            await self._client.disconnect()
+            logger.info("👋 Telegram gateway disconnected")
+
+    async def _call(self, fn, *args, **kwargs):
+        await self.start()
+        async with self._slots:
+            self.requests += 1
+            try:
+                return await fn(self._client, *args, **kwargs)
+            except Exception:
+                self.errors += 1
+                raise
+
+    async def resolve(self, channel: str):
+        """Telethon-сущность канала; ошибки Telethon (ChannelInvalidError, ValueError...) пробрасываются."""
+        return await self._call(TelegramClient.get_entity, channel)
+
+    async def resolve_channel(self, channel: str) -> dict:
+        return entity_info(await self.resolve(channel))
+
+    async def fetch_messages(self, channel: str, min_id: int = 0, offset_date: datetime = None,
+                             reverse: bool = False, limit: int = 100) -> list:
+        messages = await self._call(
+            TelegramClient.get_messages, channel,
+            limit=min(limit, TELEGRAM_MAX_FETCH), min_id=min_id or 0, offset_date=offset_date, reverse=reverse,
+        )
+        return [TelegramMessage.from_telethon(message) for message in messages]
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._client is not None and self._client.is_connected(),
+            "connected_at": self.connected_at,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
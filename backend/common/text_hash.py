@@ -0,0 +1,13 @@
+import hashlib
+import re
+
+
+def normalize_text(text: str) -> str:
+    # один и тот же текст из разных источников (каналы, повторная выгрузка PDF)
+    # отличается разве что пробелами и переносами
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(text: str, prompt_version: str) -> str:
+    """Ключ кэша ответа LLM: sha256(версия промпта + нормализованный текст)."""
+    return hashlib.sha256(f"{prompt_version}\n{normalize_text(text)}".encode()).hexdigest()
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import logging
+from typing import Optional
+import httpx
+from pydantic import ValidationError
+from app.schemas import JobPostCreate
+from common.telegram_gateway import TelegramMessage
+
+logger = logging.getLogger(__name__)
+
+FASTAPI_URL = os.getenv("FASTAPI_URL", "http://backend:8000")
+
+# Настройки HTTP-клиента к бэкенду (все через env)
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "30"))            # общий таймаут запроса, сек
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "5"))
+BACKEND_RETRIES = int(os.getenv("BACKEND_RETRIES", "3"))               # повторы на сетевых ошибках и 5xx
+BACKEND_RETRY_BACKOFF = float(os.getenv("BACKEND_RETRY_BACKOFF", "1"))  # базовая пауза, растёт x2
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "10"))
+# Тот же секрет, что у бэкенда: без него служебные эндпоинты (вакансии, отметки, шлюз Telegram) ответят 403
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+RETRY_STATUSES = {502, 503, 504}
+
+OPTIONAL_JOB_FIELDS = {name for name, field in JobPostCreate.model_fields.items() if not field.is_required()}
+
+
+def validate_job(job: dict) -> Optional[dict]:
+    """
+    Вакансия в том виде, в каком её примет /jobs/batch, или None. Поля извлекает LLM, поэтому
+    необязательное поле с негодным значением (salary "150 000", deadline "2024-13-45") обнуляется,
+    а не отбрасывает всю вакансию.
+    """
+    try:
+        return JobPostCreate.model_validate(job).model_dump(mode="json")
+    except ValidationError as e:
+        bad = {err["loc"][0] for err in e.errors() if err["loc"]}
+        error = e
+    if bad <= OPTIONAL_JOB_FIELDS:
+        try:
+            cleaned = JobPostCreate.model_validate({**job, **dict.fromkeys(bad)}).model_dump(mode="json")
+            logger.warning(f"⚠️ Вакансия {job.get('channel_name')}/{job.get('telegram_message_id')}: "
+                           f"обнулены негодные поля {sorted(bad)}")
+            return cleaned
+        except ValidationError as e:
+            error = e
+    logger.warning(f"⚠️ Вакансия {job.get('channel_name')}/{job.get('telegram_message_id')} отброшена: {error}")
+    return None
+
+
+class BackendClient:
+    """
+    Асинхронный клиент к FastAPI-бэкенду с общим keep-alive пулом соединений.
+    Использовать как `async with BackendClient() as backend: ...`.
+    """
+
+    def __init__(self, base_url: str = FASTAPI_URL):
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"X-Internal-Token": INTERNAL_API_TOKEN} if INTERNAL_API_TOKEN else None,
+            timeout=httpx.Timeout(BACKEND_TIMEOUT, connect=BACKEND_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=BACKEND_MAX_CONNECTIONS,
+                max_keepalive_connections=BACKEND_MAX_CONNECTIONS,
+            ),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Запрос с повторами и экспоненциальной паузой на сетевых ошибках и 502/503/504."""
+        for attempt in range(BACKEND_RETRIES + 1):
+            try:
+                response = await self._client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == BACKEND_RETRIES:
+                    return response
+                logger.warning(f"⚠️ {method} {url} -> {response.status_code}, повтор {attempt + 1}/{BACKEND_RETRIES}")
+            except httpx.TransportError as e:
+                if attempt == BACKEND_RETRIES:
+                    raise
+                logger.warning(f"⚠️ {method} {url}: {e!r}, повтор {attempt + 1}/{BACKEND_RETRIES}")
+            await asyncio.sleep(BACKEND_RETRY_BACKOFF * 2 ** attempt)
+
+    async def get_user_channels(self) -> list:
+        try:
+            response = await self.request("GET", "/api/v1/channels/internal/all")
+            if response.status_code == 200:
+                logger.info(f"✅ Получены каналы пользователей: {response.json()}")
+                return response.json()
+            logger.error(f"❌ Ошибка при получении каналов пользователей: {response.status_code}")
+            return []
+        except Exception as e:
+            logger.error(f"❌ Не удалось получить каналы пользователей: {e}")
+            return []
+
+    async def post_jobs(self, jobs: list) -> bool:
+        """
+        Сохраняет пачку вакансий одним запросом в /jobs/batch (дубликаты бэкенд пропускает сам).
+        False — только если бэкенд недоступен (сеть, 5xx) и пачку стоит повторить. Негодные вакансии
+        отбрасываются: кэш извлечения вернёт те же поля, и повтор остановил бы канал навсегда.
+        """
+        jobs = [job for job in map(validate_job, jobs) if job is not None]
+        if not jobs:
+            return True
+        try:
+            response = await self.request("POST", "/jobs/batch", json=jobs)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при отправке запроса: {e}")
+            return False
+        if response.status_code == 200:
+            result = response.json()
+            for rejected in result.get("rejected", []):
+                job = jobs[rejected["index"]]
+                logger.warning(f"⚠️ Бэкенд отклонил вакансию {job['channel_name']}/{job['telegram_message_id']}: "
+                               f"{rejected['error']}")
+            logger.info(f"✅ Вакансии сохранены: {result['written']} новых из {result['received']}")
+            return True
+        logger.error(f"❌ Ошибка при сохранении: {response.status_code} - {response.text}")
+        return response.status_code < 500
+
+    async def get_existing_message_ids(self, channel: str, message_ids: list) -> set:
+        """Какие сообщения канала уже сохранены. При ошибке — пустое множество (дубликаты отсечёт /jobs/batch)."""
+        if not message_ids:
+            return set()
+        try:
+            response = await self.request(
+                "POST", "/jobs/existing",
+                json={"channel_name": channel, "message_ids": message_ids},
+            )
+            if response.status_code == 200:
+                return set(response.json())
+            logger.error(f"❌ Ошибка при проверке сохранённых сообщений: {response.status_code}")
+        except Exception as e:
+            logger.error(f"❌ Не удалось проверить сохранённые сообщения: {e}")
+        return set()
+
+    async def get_sync_state(self) -> dict:
+        """High-water marks каналов: {channel_name: last_message_id}."""
+        try:
+            response = await self.request("GET", "/api/v1/channels/internal/sync_state")
+            if response.status_code == 200:
+                return response.json()
+            logger.error(f"❌ Ошибка при получении отметок каналов: {response.status_code}")
+        except Exception as e:
+            logger.error(f"❌ Не удалось получить отметки каналов: {e}")
+        return {}
+
+    async def set_sync_state(self, channel: str, last_message_id: int) -> bool:
+        try:
+            response = await self.request(
+                "PUT", f"/api/v1/channels/internal/sync_state/{channel}",
+                json={"last_message_id": last_message_id},
+            )
+            if response.status_code == 200:
+                return True
+            logger.error(f"❌ Ошибка при сохранении отметки {channel}: {response.status_code}")
+        except Exception as e:
+            logger.error(f"❌ Не удалось сохранить отметку {channel}: {e}")
+        return False
+
+    # ---------- шлюз Telegram в бэкенде: тот же интерфейс, что у TelegramGateway ----------
+
+    async def resolve_channel(self, channel: str) -> dict:
+        response = await self.request("GET", f"/api/v1/channels/internal/telegram/entity/{channel}")
+        if response.status_code != 200:
+            raise RuntimeError(f"шлюз Telegram: {response.status_code} - {response.text}")
+        return response.json()
+
+    async def fetch_messages(self, channel: str, min_id: int = 0, offset_date=None,
+                             reverse: bool = False, limit: int = 100) -> list:
+        """Сообщения канала через бэкенд. Ошибка — исключение: канал не должен сойти за пустой."""
+        params = {"min_id": min_id or 0, "reverse": reverse, "limit": limit}
+        if offset_date:
+            params["offset_date"] = offset_date.isoformat()
+        response = await self.request("GET", f"/api/v1/channels/internal/telegram/messages/{channel}", params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"шлюз Telegram: {response.status_code} - {response.text}")
+        return [TelegramMessage.from_dict(item) for item in response.json()]
@@ -4,6 +4,8 @@ import json
 import logging
 from dotenv import load_dotenv
 import openai
+from extraction_cache import ExtractionCache, cache_key
+from common.llm_rate_limiter import llm_rate_limiter, estimate_tokens, is_rate_limit_error
 
 # Настройка логирования
 logging.basicConfig(
@@ -17,10 +19,37 @@ load_dotenv()
 client = openai.AzureOpenAI(
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
     api_version="2024-02-15-preview",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
+    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    max_retries=0,  # повторы на 429 делает llm_rate_limiter
 )
 DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 
+# Меняй при любой правке промпта/постобработки — старые записи кэша перестанут совпадать
+PROMPT_VERSION = "1"
+
+extraction_cache = ExtractionCache()
+
+# Пакетный режим: сколько сообщений максимум в одном запросе и грубый бюджет входных токенов
+EXTRACTION_BATCH_SIZE = int(os.getenv("EXTRACTION_BATCH_SIZE", "5"))
+EXTRACTION_BATCH_TOKEN_BUDGET = int(os.getenv("EXTRACTION_BATCH_TOKEN_BUDGET", "3000"))
+
+class ExtractionFailed(Exception):
+    """LLM не ответил (таймаут, 5xx, сеть) — в отличие от пустого результата «не вакансия»."""
+
+
+FIELDS_SPEC = """**Fields to extract (include only if present):**
+- salary: integer (only the number, no currency symbols or words)
+- location: string (city or country)
+- deadline: string (application deadline, in YYYY-MM-DD format if possible)
+- format: string (online / offline / hybrid / remote)
+- industry: string (e.g., IT, marketing, finance)
+- contact_info: string (link, phone, or @username for contacting about the job)
+- title: string (job title, if present)
+- company: string (company name, if present)
+- description: string (full job description, if present)
+
+"""
+
 def clean_fields(fields: dict) -> dict:
     bad_values = {"not specified", "n/a", "none", "null", "", "нет", "не указано", "-"}
     cleaned = {}
@@ -37,6 +66,12 @@ def extract_fields_from_text(text: str) -> dict:
         logger.warning("⚠️ Empty text provided to extract_fields_from_text")
         return {}
 
+    key = cache_key(text, PROMPT_VERSION)
+    cached = extraction_cache.get(key)
+    if cached is not None:
+        logger.info("💾 Поля взяты из кэша извлечения")
+        return cached
+
     prompt = f"""
 You are an AI assistant that extracts structured information from job vacancy descriptions for an HR system.
 
@@ -47,18 +82,7 @@ You are an AI assistant that extracts structured information from job vacancy de
 - Do not write placeholder or garbage values ('string', 'none', 'null', '0', 'N/A', 'Not specified', '-', etc.).
 - For deadline, only return if it is a real date in YYYY-MM-DD format.
 
-**Fields to extract (include only if present):**
-- salary: integer (only the number, no currency symbols or words)
-- location: string (city or country)
-- deadline: string (application deadline, in YYYY-MM-DD format if possible)
-- format: string (online / offline / hybrid / remote)
-- industry: string (e.g., IT, marketing, finance)
-- contact_info: string (link, phone, or @username for contacting about the job)
-- title: string (job title, if present)
-- company: string (company name, if present)
-- description: string (full job description, if present)
-
-**Positive Example (vacancy):**
+{FIELDS_SPEC}**Positive Example (vacancy):**
 {{
   "title": "Backend Developer",
   "company": "Acme Corp",
@@ -77,7 +101,9 @@ Job description:
 
     try:
         logger.info("🤖 Sending request to Azure OpenAI...")
-        response = client.chat.completions.create(
+        response = llm_rate_limiter.call(
+            client.chat.completions.create,
+            estimated_tokens=estimate_tokens(prompt) + 1200,
             model=DEPLOYMENT_NAME,
             messages=[
                 {"role": "system", "content": "You extract job vacancy information in strict JSON format according to the given template."},
@@ -98,11 +124,120 @@ Job description:
             json_str = json_match.group()
             result = json.loads(json_str)
         result = clean_fields(result)
+        # кэшируем только успешно разобранный ответ (в том числе пустой — «не вакансия»)
+        extraction_cache.set(key, result)
         logger.info(f"✨ Successfully extracted fields: {result}")
         return result
     except json.JSONDecodeError as e:
         logger.error(f"❌ Failed to parse JSON from OpenAI response: {e}")
         return {}
     except Exception as e:
+        if is_rate_limit_error(e):
+            # квота исчерпана и после повторов — пусть ингестер не сдвигает отметку канала
+            raise
         logger.error(f"❌ Unexpected error in extract_fields_from_text: {e}")
-        return {}
+        # не {}: пустой результат значит «не вакансия», а это сообщение надо будет перечитать
+        raise ExtractionFailed(str(e)) from e
+
+
+def plan_batches(items: list) -> list:
+    """Режет [(message_id, text), ...] на пачки не длиннее EXTRACTION_BATCH_SIZE и бюджета токенов."""
+    batches, current, current_tokens = [], [], 0
+    for message_id, text in items:
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= EXTRACTION_BATCH_SIZE or current_tokens + tokens > EXTRACTION_BATCH_TOKEN_BUDGET):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append((message_id, text))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def extract_fields_batch(items: list) -> dict:
+    """
+    Извлекает поля сразу для нескольких вакансий одним запросом.
+    На входе [(message_id, text), ...], на выходе {message_id: fields}.
+    Сообщения, которых нет в ответе (битый JSON, пропуски, ошибка API), в результат
+    не попадают — вызывающий код должен дообработать их через extract_fields_from_text.
+    """
+    results, pending = {}, []
+    for message_id, text in items:
+        if not text:
+            results[message_id] = {}
+            continue
+        cached = extraction_cache.get(cache_key(text, PROMPT_VERSION))
+        if cached is not None:
+            results[message_id] = cached
+        else:
+            pending.append((message_id, text))
+    if not pending:
+        return results
+
+    vacancies = "\n\n".join(f"### message_id: {message_id}\n{text}" for message_id, text in pending)
+    prompt = f"""
+You are an AI assistant that extracts structured information from job vacancy descriptions for an HR system.
+Below are several independent Telegram messages, each starting with a "### message_id: <id>" header.
+
+**Instructions:**
+- Отвечай только валидным JSON, без пояснений, markdown и прочего.
+- Return a JSON array with exactly one object per message, in any order.
+- Every object must contain "message_id" (integer, copied from the header) plus the extracted fields.
+- Do not return a field if you cannot find a real value. Do not mix data between messages.
+- Do not write placeholder or garbage values ('string', 'none', 'null', '0', 'N/A', 'Not specified', '-', etc.).
+- For deadline, only return if it is a real date in YYYY-MM-DD format.
+
+{FIELDS_SPEC}**Positive Example (two messages):**
+[
+  {{"message_id": 101, "title": "Backend Developer", "salary": 150000, "location": "Moscow, Russia", "format": "online", "description": "We are looking for a backend developer..."}},
+  {{"message_id": 102, "title": "Бухгалтер", "location": "Алматы", "contact_info": "@hr_kz", "description": "Требуется бухгалтер..."}}
+]
+
+Messages:
+{vacancies}
+"""
+    # ответ содержит описание каждой вакансии, поэтому выход ~ вход + служебные поля
+    max_tokens = min(4000, sum(estimate_tokens(text) for _, text in pending) + 300 * len(pending))
+
+    try:
+        logger.info(f"🤖 Sending batch request to Azure OpenAI ({len(pending)} messages)...")
+        response = llm_rate_limiter.call(
+            client.chat.completions.create,
+            estimated_tokens=estimate_tokens(prompt) + max_tokens,
+            model=DEPLOYMENT_NAME,
+            messages=[
+                {"role": "system", "content": "You extract job vacancy information in strict JSON format according to the given template."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.2,
+            max_tokens=max_tokens,
+        )
+        raw_text = response.choices[0].message.content.strip()
+        json_match = re.search(r"\[.*\]", raw_text, re.DOTALL)
+        if not json_match:
+            logger.error("❌ No JSON array found in batch OpenAI response")
+            return results
+        parsed = json.loads(json_match.group())
+    except Exception as e:
+        logger.error(f"❌ Batch extraction failed, falling back to per-message calls: {e}")
+        return results
+
+    texts = dict(pending)
+    for entry in parsed if isinstance(parsed, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            message_id = int(entry.pop("message_id"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if message_id not in texts or message_id in results:
+            continue
+        fields = clean_fields(entry)
+        extraction_cache.set(cache_key(texts[message_id], PROMPT_VERSION), fields)
+        results[message_id] = fields
+
+    missing = len(items) - len(results)
+    if missing:
+        logger.warning(f"⚠️ Batch response is missing {missing} messages, they will be extracted one by one")
+    return results
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from common.text_hash import cache_key  # noqa: F401 — ключ кэша импортируют отсюда
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", "extraction_cache.sqlite3")
+EXTRACTION_CACHE_TTL_DAYS = float(os.getenv("EXTRACTION_CACHE_TTL_DAYS", "30"))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "20000"))
+
+
+class ExtractionCache:
+    """
+    Персистентный кэш результатов extract_fields_from_text в SQLite-файле.
+    Ключ — sha256(версия промпта + нормализованный текст). Записи старше TTL
+    не отдаются, при переполнении вытесняются давно не использованные.
+    Потокобезопасен: извлечение вызывается из asyncio.to_thread.
+    """
+
+    def __init__(self, path: str = EXTRACTION_CACHE_PATH, ttl_days: float = EXTRACTION_CACHE_TTL_DAYS,
+                 max_entries: int = EXTRACTION_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_days * 86400
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_extraction_cache_accessed ON extraction_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM extraction_cache WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE extraction_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, result: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (key, result, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), now, now),
+            )
+            self._conn.commit()
+
+    def evict(self) -> int:
+        """Удаляет протухшие записи и всё сверх max_entries (по давности использования)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM extraction_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            removed = cur.rowcount
+            cur = self._conn.execute("""
+                DELETE FROM extraction_cache WHERE key IN (
+                    SELECT key FROM extraction_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            removed += cur.rowcount
+            self._conn.commit()
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT count(*) FROM extraction_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "size": size,
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
@@ -1,11 +1,13 @@
 import asyncio
 import os
-import requests
 import logging
-from telethon import TelegramClient
-from telethon.tl.types import Message
 from dotenv import load_dotenv
-from extract_with_gemini import extract_fields_from_text
+from extract_with_gemini import (
+    extract_fields_from_text, extract_fields_batch, plan_batches, extraction_cache, EXTRACTION_BATCH_SIZE,
+)
+from common.llm_rate_limiter import llm_rate_limiter, is_rate_limit_error
+from backend_client import BackendClient
+from common.telegram_gateway import TelegramGateway, TelegramMessage, TELEGRAM_SESSION
 from datetime import datetime, timedelta, timezone
 import json
 
@@ -23,109 +25,234 @@ api_hash = os.getenv("TG_API_HASH")
 
 GLOBAL_CHANNELS = ["jobforjunior", "jobkz_1", "kzdailyjobs", "kz_bi_jobs", "careercentervacancies", "devs_it", "juniors_rabota_jobs", "evacuatejobs", "halyk_jumys", "remote_kazakhstan"]
 
-client = TelegramClient("tg_session", api_id, api_hash)
-
-FASTAPI_URL = os.getenv("FASTAPI_URL", "http://backend:8000")
+# backend — через шлюз в бэкенде (он владеет сессией), local — свой клиент, когда бэкенд не запущен
+TELEGRAM_GATEWAY = os.getenv("TELEGRAM_GATEWAY", "backend")  # backend | local
 
 FIRST_RUN = os.getenv("FIRST_RUN", "false").lower() == "true"
 
-def get_user_channels():
-    try:
-        response = requests.get(f"{FASTAPI_URL}/api/v1/channels/internal/all")
-        if response.status_code == 200:
-            logger.info(f"✅ Получены каналы пользователей: {response.json()}")
-            return response.json()
-        else:
-            logger.error(f"❌ Ошибка при получении каналов пользователей: {response.status_code}")
-            return []
-    except Exception as e:
-        logger.error(f"❌ Не удалось получить каналы пользователей: {e}")
-        return []
+# Сколько каналов читаем одновременно
+CHANNEL_CONCURRENCY = int(os.getenv("CHANNEL_CONCURRENCY", "4"))
+# Общий на все каналы лимит одновременных вызовов LLM; темп по квоте держит llm_rate_limiter
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+# Сколько сообщений обрабатываем пачкой: проверка дубликатов, запись в бэкенд, сдвиг high-water mark
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "20"))
+# Потолок новых сообщений на канал за один запуск; остальное дочитаем в следующий раз
+MAX_NEW_MESSAGES = int(os.getenv("MAX_NEW_MESSAGES", "200"))
+
+def build_job(ch: str, message: TelegramMessage, fields: dict, raw_title: str, raw_description: str) -> dict:
+    # fallback на сырой текст, если LLM не вернул title/description
+    title = fields.get("title") or raw_title
+    description = fields.get("description") or raw_description
+
+    contact_info = fields.get("contact_info")
+    if contact_info and contact_info.strip():
+        contact_info_value = contact_info.strip()
+    else:
+        contact_info_value = f"https://t.me/{ch}"
+
+    return {
+        "title": title.strip(),
+        "description": description.strip(),
+        "telegram_message_id": message.id,
+        "channel_name": ch,
+        "created_at": message.date.replace(tzinfo=None).isoformat(),
+        "parsed_at": datetime.utcnow().isoformat(),
+        "contact_info": contact_info_value,
+        "salary": fields.get("salary"),
+        "location": fields.get("location"),
+        "deadline": fields.get("deadline"),
+        "format": fields.get("format"),
+        "industry": fields.get("industry"),
+    }
+
+
+async def extract_fields(raw_description: str, llm_slots: asyncio.Semaphore) -> dict:
+    async with llm_slots:
+        # синхронный вызов LLM уводим в поток, чтобы не стопорить Telethon и другие каналы
+        return await asyncio.to_thread(extract_fields_from_text, raw_description)
+
+
+async def iter_new_messages(telegram, ch: str, last_id: int = None, since=None):
+    """
+    Сообщения канала от старых к новым, чтобы high-water mark можно было двигать по ходу.
+    Есть отметка — читаем только то, что после неё (min_id). Нет отметки — как раньше:
+    FIRST_RUN берёт до 100 сообщений за последние 7 дней, обычный запуск — последние 20.
+    """
+    if last_id:
+        messages = await telegram.fetch_messages(ch, min_id=last_id, reverse=True, limit=MAX_NEW_MESSAGES)
+    elif since:
+        messages = await telegram.fetch_messages(ch, offset_date=since, reverse=True, limit=100)
+    else:
+        messages = list(reversed(await telegram.fetch_messages(ch, limit=20)))
+    for message in messages:
+        yield message
+
+
+async def chunked(messages, size: int):
+    chunk = []
+    async for message in messages:
+        chunk.append(message)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def split_message(message, since=None):
+    """(raw_title, raw_description) или None, если сообщение не подходит для разбора."""
+    if since and message.date < since:
+        return None
+    if not message.message:
+        return None
+    lines = message.message.strip().split("\n", 1)
+    raw_title = lines[0][:100] if lines else "No Title"
+    raw_description = lines[1] if len(lines) > 1 else ""
+    return raw_title, raw_description
+
+
+async def extract_chunk(items: list, llm_slots: asyncio.Semaphore) -> dict:
+    """
+    Поля для [(message_id, text), ...] -> {message_id: fields}.
+    При EXTRACTION_BATCH_SIZE > 1 сначала пакетные запросы, затем по одному —
+    для сообщений, которые пакетный ответ не покрыл. Сообщения, для которых LLM
+    не ответил (ExtractionFailed), в результат не попадают.
+    """
+    results = {}
+    if EXTRACTION_BATCH_SIZE > 1:
+        for batch in plan_batches(items):
+            if len(batch) < 2:
+                continue  # одиночное сообщение дешевле обычным промптом
+            async with llm_slots:
+                results.update(await asyncio.to_thread(extract_fields_batch, batch))
+    for message_id, text in items:
+        if message_id in results:
+            continue
+        try:
+            results[message_id] = await extract_fields(text, llm_slots)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                # пачку не засчитываем: канал остановится и дочитается со следующего запуска
+                raise
+            logger.error(f"❌ Gemini parse error: {e}")
+            break  # канал всё равно остановится на этом сообщении — остальные не извлекаем
+    return results
+
+
+def to_job(ch: str, message, fields: dict, raw_title: str, raw_description: str):
+    """Вакансия для сохранения или None, если LLM не нашёл ключевых полей."""
+    logger.info(f"✨ Извлеченные поля: {fields}")
+    if not fields or (not fields.get("title") and not fields.get("description")):
+        logger.info("🚫 Нет ключевых полей (title/description), не сохраняем.")
+        return None
+    data = build_job(ch, message, fields, raw_title, raw_description)
+    logger.debug(f"📦 Финальные данные для сохранения: {json.dumps(data, ensure_ascii=False, indent=2)}")
+    return data
+
+
+async def process_channel(ch: str, backend: BackendClient, telegram, llm_slots: asyncio.Semaphore, since=None, last_id: int = None):
+    logger.info(f"\n📡 Чтение из канала: {ch} (после сообщения {last_id or '—'})")
+    jobs = []
+    high_water = saved_mark = last_id
+
+    async def flush():
+        # отметку двигаем только после записи — если бэкенд недоступен, вакансии дочитаем в следующий раз.
+        # Отклонённые вакансии post_jobs отбрасывает и отметку не держит
+        nonlocal jobs, saved_mark
+        if not await backend.post_jobs(jobs):
+            raise RuntimeError(f"не удалось сохранить вакансии канала {ch}")
+        jobs = []
+        if high_water and high_water != saved_mark:
+            await backend.set_sync_state(ch, high_water)
+            saved_mark = high_water
 
-def post_job(data):
     try:
-        response = requests.post(f"{FASTAPI_URL}/jobs", json=data)
-        if response.status_code == 200:
-            logger.info(f"✅ Вакансия сохранена: {data['title']}")
-        else:
-            logger.error(f"❌ Ошибка при сохранении: {response.status_code} - {response.text}")
+        async for chunk in chunked(iter_new_messages(telegram, ch, last_id, since), INGEST_BATCH_SIZE):
+            # уже сохранённые сообщения отсекаем одним запросом, до любых вызовов LLM
+            known = await backend.get_existing_message_ids(ch, [message.id for message in chunk])
+            if known:
+                logger.info(f"⏭️ {ch}: пропускаем {len(known)} уже сохранённых сообщений")
+            parts = {}
+            for message in chunk:
+                if message.id not in known:
+                    split = split_message(message, since)
+                    if split:
+                        parts[message.id] = split
+            fields_by_id = await extract_chunk(
+                [(message_id, raw_description) for message_id, (_, raw_description) in parts.items()],
+                llm_slots,
+            )
+            failed = None
+            for message in chunk:
+                if message.id in parts and message.id not in fields_by_id:
+                    failed = message  # извлечение не удалось — отметку дальше не двигаем
+                    break
+                if message.id in fields_by_id:
+                    raw_title, raw_description = parts[message.id]
+                    data = to_job(ch, message, fields_by_id[message.id], raw_title, raw_description)
+                    if data:
+                        jobs.append(data)
+                # сообщение обработано (в том числе не-вакансия) — дальше его не перечитываем
+                high_water = message.id
+            await flush()
+            if failed:
+                logger.warning(f"⚠️ {ch}: не удалось извлечь поля сообщения {failed.id}, дочитаем канал со следующего запуска")
+                break
     except Exception as e:
-        logger.error(f"❌ Ошибка при отправке запроса: {e}")
+        logger.error(f"❌ Ошибка при чтении канала {ch}: {e}")
+    # то, что успели извлечь до ошибки, всё равно сохраняем
+    await flush()
+
 
 async def main():
+    backend = BackendClient()
+    local_gateway = None
+    if TELEGRAM_GATEWAY == "local":
+        local_gateway = TelegramGateway(TELEGRAM_SESSION, api_id, api_hash)
+    # у шлюза и BackendClient одинаковый интерфейс: fetch_messages / resolve_channel
+    telegram = local_gateway or backend
     try:
-        await client.start()
-        logger.info("🔌 Connected to Telegram!")
+        if local_gateway:
+            await local_gateway.start(interactive=True)
+        logger.info(f"🔌 Telegram через шлюз: {TELEGRAM_GATEWAY}")
 
-        user_channels = get_user_channels()
+        user_channels = await backend.get_user_channels()
         all_channels = list(set(GLOBAL_CHANNELS + user_channels))
         logger.info(f"📢 Все каналы для парсинга: {all_channels}")
+        sync_state = await backend.get_sync_state()
+        evicted = extraction_cache.evict()
+        extraction_cache.reset_stats()
+        logger.info(f"💾 Кэш извлечения: вытеснено {evicted}, записей {extraction_cache.stats()['size']}")
 
+        since = None
         if FIRST_RUN:
-            one_week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+            since = datetime.now(timezone.utc) - timedelta(days=7)
             logger.info("⏳ Первый запуск: парсим только сообщения за последние 7 дней")
         else:
-            logger.info("⏰ Обычный запуск: парсим только последние 20 сообщений")
-
-        for ch in all_channels:
-            logger.info(f"\n📡 Чтение из канала: {ch}")
-            try:
-                limit = 100 if FIRST_RUN else 20
-                async for message in client.iter_messages(ch, limit=limit):
-                    if FIRST_RUN and message.date < one_week_ago:
-                        continue
-                    if isinstance(message, Message) and message.message:
-                        lines = message.message.strip().split("\n", 1)
-                        raw_title = lines[0][:100] if lines else "No Title"
-                        raw_description = lines[1] if len(lines) > 1 else ""
-
-                        # Сначала извлекаем поля
-                        try:
-                            fields = extract_fields_from_text(raw_description)
-                            logger.info(f"✨ Извлеченные поля: {fields}")
-                            if not fields or (not fields.get("title") and not fields.get("description")):
-                                logger.info("🚫 Нет ключевых полей (title/description), не сохраняем.")
-                                continue
-                            await asyncio.sleep(4.2)  # ⏱️ защита от лимитов Gemini
-                        except Exception as e:
-                            logger.error(f"❌ Gemini parse error: {e}")
-                            continue
-
-                        # Затем fallback логика
-                        title = fields.get("title") or raw_title
-                        description = fields.get("description") or raw_description
-
-                        contact_info = fields.get("contact_info")
-                        if contact_info and contact_info.strip():
-                            contact_info_value = contact_info.strip()
-                        else:
-                            contact_info_value = f"https://t.me/{ch}"
-
-                        data = {
-                            "title": title.strip(),
-                            "description": description.strip(),
-                            "telegram_message_id": message.id,
-                            "channel_name": ch,
-                            "created_at": message.date.replace(tzinfo=None).isoformat(),
-                            "parsed_at": datetime.utcnow().isoformat(),
-                            "contact_info": contact_info_value,
-                            "salary": fields.get("salary"),
-                            "location": fields.get("location"),
-                            "deadline": fields.get("deadline"),
-                            "format": fields.get("format"),
-                            "industry": fields.get("industry"),
-                        }
-
-                        logger.debug(f"📦 Финальные данные для сохранения: {json.dumps(data, ensure_ascii=False, indent=2)}")
-                        post_job(data)
-            except Exception as e:
-                logger.error(f"❌ Ошибка при чтении канала {ch}: {e}")
+            logger.info("⏰ Обычный запуск: парсим только новые сообщения после сохранённых отметок")
+
+        channel_slots = asyncio.Semaphore(CHANNEL_CONCURRENCY)
+        llm_slots = asyncio.Semaphore(LLM_CONCURRENCY)
+        logger.info(f"🚦 Каналов одновременно: {CHANNEL_CONCURRENCY}, вызовов LLM одновременно: {LLM_CONCURRENCY}")
+
+        async def run(ch):
+            async with channel_slots:
+                await process_channel(ch, backend, telegram, llm_slots, since, sync_state.get(ch))
+
+        # ошибка одного канала не должна ронять остальные
+        results = await asyncio.gather(*(run(ch) for ch in all_channels), return_exceptions=True)
+        for ch, result in zip(all_channels, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Канал {ch} завершился с ошибкой: {result}")
+        logger.info(f"💾 Кэш извлечения за запуск: {extraction_cache.stats()}")
+        logger.info(f"🚦 LLM лимитер за запуск: {llm_rate_limiter.stats}")
 
     except Exception as e:
         logger.error(f"❌ Critical error: {e}")
     finally:
-        await client.disconnect()
-        logger.info("👋 Disconnected from Telegram")
+        await backend.close()
+        if local_gateway:
+            await local_gateway.close()
 
 
 if __name__ == "__main__":
@@ -133,5 +260,3 @@ if __name__ == "__main__":
         asyncio.run(main())
     else:
         print("🛑 Telegram парсинг отключён в dev-среде.")
-
-
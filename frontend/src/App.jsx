@@ -124,7 +124,8 @@ function UploadResume({ user, onSessionExpired }) {
         'Authorization': `Bearer ${storedUser.token}` // Используем токен отсюда
       };
 
-      const res = await fetch(`${API_URL}/upload_resume`, {
+      // Фоновый режим: сервер сразу отвечает 202 с task_id, дальше опрашиваем статус
+      const res = await fetch(`${API_URL}/upload_resume?background=true`, {
         method: 'POST',
         headers: headers,
         mode: 'cors',
@@ -140,7 +141,14 @@ function UploadResume({ user, onSessionExpired }) {
         }
         throw new Error(t('auth.error_upload_resume'));
               }
-        await res.json(); // Получаем ответ, но не используем сообщение с сервера
+        let task = await res.json();
+        while (task.status === 'queued' || task.status === 'processing') {
+          await new Promise(resolve => setTimeout(resolve, 2000));
+          const statusRes = await fetch(`${API_URL}/upload_resume/${task.task_id}`, { headers, mode: 'cors' });
+          if (!statusRes.ok) throw new Error(t('auth.error_upload_resume'));
+          task = await statusRes.json();
+        }
+        if (task.status !== 'done') throw new Error(t('auth.error_upload_resume'));
         setSuccess(t('upload.success'));
     } catch (e) {
       setError(e.message);
@@ -245,7 +253,7 @@ function Recommendations({ user, onSessionExpired }) {
     setLoading(true);
     setError(null);
     try {
-      const res = await fetch(`${API_URL}/recommendations?user_id=${user.id}`);
+      const res = await fetch(`${API_URL}/recommendations/stream?user_id=${user.id}`);
       if (!res.ok) {
         if (res.status === 401 || res.status === 403) {
           // Session expired, trigger auth modal
@@ -256,9 +264,36 @@ function Recommendations({ user, onSessionExpired }) {
         }
         throw new Error(t('auth.error_fetch_recommendations'));
       }
-      const data = await res.json();
-      setRecs(data);
-      setPage(0); // Reset to first page on new fetch
+      // NDJSON: сначала быстрый локальный список, затем вакансии в порядке LLM, в конце "done"
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let localRecs = [];
+      let llmRecs = [];
+      const handleFrame = (frame) => {
+        if (frame.type === 'candidates') {
+          localRecs = frame.items;
+          setRecs(localRecs);
+          setPage(0); // Reset to first page on new fetch
+          setLoading(false);
+        } else if (frame.type === 'job') {
+          // вакансии от LLM встают наверх, ниже пока остаются ещё не оценённые локальные
+          llmRecs = [...llmRecs, frame.item];
+          const ranked = new Set(llmRecs.map(rec => rec.id));
+          setRecs([...llmRecs, ...localRecs.filter(rec => !ranked.has(rec.id))]);
+        } else if (frame.type === 'done' && frame.source === 'llm') {
+          setRecs(llmRecs);
+        }
+      };
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => handleFrame(JSON.parse(line)));
+      }
+      if (buffer.trim()) handleFrame(JSON.parse(buffer));
     } catch (e) {
       setError(e.message);
     } finally {
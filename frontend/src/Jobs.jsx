@@ -8,6 +8,7 @@ const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 // formatOptions будет создан внутри компонента для доступа к t()
 
 const JOBS_PER_PAGE = 5;
+const API_PAGE_SIZE = 50; // сколько вакансий запрашиваем у бэкенда за раз (курсорная пагинация)
 
 function Jobs() {
   const { t } = useTranslation();
@@ -22,6 +23,8 @@ function Jobs() {
     location: '',
   });
   const [page, setPage] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [lastUrl, setLastUrl] = useState(null);
 
   const formatOptions = [
     { value: '', label: t('jobs.format_any') },
@@ -70,13 +73,16 @@ function Jobs() {
       // Проверяем есть ли фильтры
       const hasFilters = params.toString().length > 0;
       
+      params.append('limit', API_PAGE_SIZE);
       const url = hasFilters
         ? `${API_URL}/jobs/search?${params.toString()}`
-        : `${API_URL}/jobs`; // Используем /jobs для всех вакансий без фильтров
+        : `${API_URL}/jobs?${params.toString()}`; // Используем /jobs для всех вакансий без фильтров
       const res = await fetch(url);
               if (!res.ok) throw new Error(t('auth.error_fetch_jobs'));
       const data = await res.json();
-      setJobs(data);
+      setJobs(data.items);
+      setNextCursor(data.next_cursor);
+      setLastUrl(url);
       setPage(0); // Reset to first page on new search
     } catch (e) {
       setError(e.message);
@@ -85,6 +91,23 @@ function Jobs() {
     }
   };
 
+  // Догружаем следующую порцию вакансий по next_cursor
+  const fetchMoreJobs = async () => {
+    if (!nextCursor || !lastUrl) return;
+    setLoading(true);
+    try {
+      const res = await fetch(`${lastUrl}&cursor=${encodeURIComponent(nextCursor)}`);
+      if (!res.ok) throw new Error(t('auth.error_fetch_jobs'));
+      const data = await res.json();
+      setJobs(prev => [...prev, ...data.items]);
+      setNextCursor(data.next_cursor);
+    } catch (e) {
+      setError(e.message);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   useEffect(() => { fetchJobs(); }, []);
 
   const handleFilterChange = e => {
@@ -106,7 +129,7 @@ function Jobs() {
   const totalPages = Math.ceil(jobs.length / JOBS_PER_PAGE);
   const paginatedJobs = jobs.slice(page * JOBS_PER_PAGE, (page + 1) * JOBS_PER_PAGE);
   const canPrev = page > 0;
-  const canNext = page < totalPages - 1;
+  const canNext = page < totalPages - 1 || !!nextCursor;
 
   // Функции для пагинации со скроллом наверх
   const handlePrevPage = () => {
@@ -114,7 +137,10 @@ function Jobs() {
     window.scrollTo({ top: 0, behavior: 'smooth' });
   };
 
-  const handleNextPage = () => {
+  const handleNextPage = async () => {
+    if (page + 1 >= totalPages - 1 && nextCursor) {
+      await fetchMoreJobs();
+    }
     setPage(page + 1);
     window.scrollTo({ top: 0, behavior: 'smooth' });
   };
@@ -237,7 +263,7 @@ function Jobs() {
             ))}
           </div>
           {/* Pagination Controls */}
-          {totalPages > 1 && (
+          {(totalPages > 1 || nextCursor) && (
             <div className="pagination-container">
               <button
                 onClick={handlePrevPage}